@@ -41,16 +41,19 @@ class MyAdminIndexView(AdminIndexView):
             flash('You need to login as a superuser to access the Backend')
             return redirect(url_for('security.logout'))
 
-# Create admin
-admin = Admin(
-    name='Admin Area',
-    index_view=MyAdminIndexView(),
-    template_mode="bootstrap3",
-    base_template='/admin/my_base.html'
-)
-
-# Add model views
-admin.add_view(MyModelView(ApiItem, db.session))
-admin.add_view(MyModelView(Endpoint, db.session))
-admin.add_view(MyModelView(Field, db.session))
-admin.add_view(MyModelView(Tag, db.session))
+def init_admin(app):
+    """Builds the admin area and its model views for app."""
+    admin = Admin(
+        name='Admin Area',
+        index_view=MyAdminIndexView(),
+        template_mode="bootstrap3",
+        base_template='/admin/my_base.html'
+    )
+
+    # Add model views
+    admin.add_view(MyModelView(ApiItem, db.session))
+    admin.add_view(MyModelView(Endpoint, db.session))
+    admin.add_view(MyModelView(Field, db.session))
+    admin.add_view(MyModelView(Tag, db.session))
+    admin.init_app(app)
+    return admin
@@ -1,47 +1,105 @@
-from flask_restx import Api, Namespace, Resource, inputs, fields
+import csv, io, json
+
+from flask import current_app, request, Response, stream_with_context
+from flask_restx import Api, Namespace, Resource, inputs, fields, reqparse
 
 from forms import ApiInputValidation as iv
 from crud import CRUD
 from models import ApiItem, Endpoint
-from schemas import api_schema, apis_schema, endpoint_schema, endpoints_schema, field_schema
+from schemas import api_schema, api_raw_schema, apis_schema, endpoint_schema, endpoints_schema, field_schema
+from schemas import ApiSchema, EndpointSchema, schema_variant
+from serializers import fast_dump
 from extensions import csrf
+from cache import cached
 from config import Globals
-
-api = Api(
-    title='CRUD API',
-    version='1.0',
-    description='API for CRUD operations',
-    doc='/swagger',
-    validate=True,
-    prefix='/api',
-    decorators=[csrf.exempt]
-)
+from utils import encode_cursor, decode_cursor, iter_ndjson, flatten_json
+
+sparse_parser = reqparse.RequestParser()
+sparse_parser.add_argument('fields', type=str, required=False)
+sparse_parser.add_argument('exclude', type=str, required=False)
+sparse_parser.add_argument('depth', type=int, required=False)
+
+SPARSE_PARAMS = {
+    'fields': "Comma separated fields to return, dotted for nested ones: id,label,endpoints.url. Ids are always returned.",
+    'exclude': "Comma separated fields to leave out, dotted for nested ones: endpoints.api_item",
+    'depth': "How many levels of nested objects to return. 0 returns no nested object."
+}
+
+def requested_schema(schema_class, default, args, many=False):
+    """Returns the schema variant matching the fields, exclude and depth args,
+    or the default schema when none is given. Raises ValueError."""
+    def split(value):
+        return tuple(sorted(set(f.strip() for f in value.split(',') if f.strip()))) if value else None
+
+    only, exclude, depth = split(args.get('fields')), split(args.get('exclude')), args.get('depth')
+    if not only and not exclude and depth is None:
+        return default
+    return schema_variant(schema_class, many=many, only=only, exclude=exclude, depth=depth)
+
+# Namespaces of the API, registered on the Api of every app by init_api
+NAMESPACES = []
+
+def init_api(app):
+    """Builds the restx Api of app, which keeps the app and its options, and
+    registers every namespace on it. The Swagger documentation is left out
+    unless SWAGGER_ENABLED."""
+    api = Api(
+        title='CRUD API',
+        version='1.0',
+        description='API for CRUD operations',
+        doc='/swagger',
+        validate=True,
+        prefix='/api',
+        decorators=[csrf.exempt]
+    )
+    for ns in NAMESPACES:
+        api.add_namespace(ns)
+    api.init_app(app, add_specs=app.config['SWAGGER_ENABLED'])
+    app.extensions['api'] = api
+    return api
 
 apis_ns = Namespace('apis', 'API items CRUD operations')
-api.add_namespace(apis_ns)
+NAMESPACES.append(apis_ns)
 
 @apis_ns.route('/')
 class Apis(Resource):
-    get_parser = api.parser()
+    get_parser = sparse_parser.copy()
     get_parser.add_argument('count', type=inputs.boolean, required=False)
     get_parser.add_argument('tags', type=str, required=False)
     get_parser.add_argument('page', type=int, required=False)
+    get_parser.add_argument('cursor', type=str, required=False)
+    get_parser.add_argument('sort', type=str, required=False, choices=Globals.ACCEPTED_SORT_COLUMNS)
     @apis_ns.expect(get_parser)
-    @apis_ns.doc(description="Get the count or a list of API items by query", params={
+    @apis_ns.doc(description="Get the count or a list of API items by query", params=dict({
         'count': "A boolean. If True returns just the count of all APIs.",
         'page': "The requested page of API items (page 1 by default).",
-        'tags': "Search APIs by tags."
-    })
+        'tags': "Search APIs by tags.",
+        'cursor': "Cursor pagination. Pass an empty cursor for the first page, then the returned next_cursor. Not combinable with tags.",
+        'sort': "The column to sort by in cursor pagination. Must be in %s" % Globals.ACCEPTED_SORT_COLUMNS
+    }, **SPARSE_PARAMS))
     def get(self):
         args = self.get_parser.parse_args()
         count = args.get('count')
         page = args.get('page')
         tags = args.get('tags')
+        cursor = args.get('cursor')
+        sort = args.get('sort')
         if count:
             return JsonMethods.get_apis_count()
-        return JsonMethods.get_apis(tags=tags, page=page)
-
-    post_parser = api.parser()
+        try:
+            schema = requested_schema(ApiSchema, apis_schema, args, many=True)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        if cursor is not None:
+            if tags:
+                return {'status': 'error', 'message': 'tags cannot be combined with cursor pagination'}, 400
+            try:
+                return JsonMethods.get_apis_after(cursor, sort=sort, schema=schema)
+            except ValueError as e:
+                return {'status': 'error', 'message': str(e)}, 400
+        return JsonMethods.get_apis(tags=tags, page=page, schema=schema)
+
+    post_parser = reqparse.RequestParser()
     post_parser.add_argument('label', type=iv.str_validation(max=80), required=True)
     post_parser.add_argument('url', type=iv.url_validation(type='endpoint'), required=True)
     post_parser.add_argument('description', type=iv.str_validation(max=400), required=False)
@@ -63,13 +121,22 @@ class Apis(Resource):
 
 @apis_ns.route('/<int:id>')
 class ApiItems(Resource):
-    @apis_ns.doc(description="Get an API item by id", params={
+    get_parser = sparse_parser.copy()
+    @apis_ns.expect(get_parser)
+    @apis_ns.doc(description="Get an API item by id", params=dict({
         'id': "The id of the API"
-    })
+    }, **SPARSE_PARAMS))
+    @cached(lambda api, id: ['api:%d' % id, 'api:%d:endpoints' % id] + [
+        'endpoint:%d' % e['id'] for e in api.get('endpoints', [])
+    ], parser=get_parser)
     def get(self, id):
-        return JsonMethods.get_api(id)
+        try:
+            schema = requested_schema(ApiSchema, api_schema, self.get_parser.parse_args())
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        return JsonMethods.get_api(id, schema=schema)
 
-    patch_parser = api.parser()
+    patch_parser = reqparse.RequestParser()
     patch_parser.add_argument('label', type=iv.str_validation(max=80), required=False)
     patch_parser.add_argument('url', type=iv.url_validation(type='endpoint'), required=False)
     patch_parser.add_argument('description', type=iv.str_validation(max=400), required=False)
@@ -97,33 +164,52 @@ class ApiItems(Resource):
         return JsonMethods.delete_api(id)
 
 endpoints_ns = Namespace('endpoints', 'Endpoints CRUD operations')
-api.add_namespace(endpoints_ns)
+NAMESPACES.append(endpoints_ns)
 
 @endpoints_ns.route('/')
 class Endpoints(Resource):
-    get_parser = api.parser()
+    get_parser = sparse_parser.copy()
     get_parser.add_argument('count', type=inputs.boolean, required=False)
     get_parser.add_argument('tags', type=str, required=False)
     get_parser.add_argument('page', type=int, required=False)
     get_parser.add_argument('api_id', type=int, required=False)
+    get_parser.add_argument('cursor', type=str, required=False)
+    get_parser.add_argument('sort', type=str, required=False, choices=Globals.ACCEPTED_SORT_COLUMNS)
     @endpoints_ns.expect(get_parser)
-    @endpoints_ns.doc(description="Get the count or a list of API items by query", params={
+    @endpoints_ns.doc(description="Get the count or a list of API items by query", params=dict({
         'count': "A boolean. If True returns just the count of all APIs.",
         'page': "The requested page of API items (page 1 by default)",
         'tags': "Search APIs by tags",
-        'api_id': "Use this id to get the corresponding API item endpoints list"
-    })
+        'api_id': "Use this id to get the corresponding API item endpoints list",
+        'cursor': "Cursor pagination. Pass an empty cursor for the first page, then the returned next_cursor. Not combinable with tags.",
+        'sort': "The column to sort by in cursor pagination. Must be in %s" % Globals.ACCEPTED_SORT_COLUMNS
+    }, **SPARSE_PARAMS))
     def get(self):
         args = self.get_parser.parse_args()
         count = args.get('count')
         page = args.get('page')
         tags = args.get('tags')
         api_id = args.get('api_id')
+        cursor = args.get('cursor')
+        sort = args.get('sort')
         if count:
+            if api_id:
+                return JsonMethods.get_api_endpoints_count(api_id)
             return JsonMethods.get_endpoints_count()
-        return JsonMethods.get_endpoints(api_id=api_id, page=page, tags=tags)
-
-    post_parser = api.parser()
+        try:
+            schema = requested_schema(EndpointSchema, endpoints_schema, args, many=True)
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        if cursor is not None:
+            if tags:
+                return {'status': 'error', 'message': 'tags cannot be combined with cursor pagination'}, 400
+            try:
+                return JsonMethods.get_endpoints_after(cursor, sort=sort, api_id=api_id, schema=schema)
+            except ValueError as e:
+                return {'status': 'error', 'message': str(e)}, 400
+        return JsonMethods.get_endpoints(api_id=api_id, page=page, tags=tags, schema=schema)
+
+    post_parser = reqparse.RequestParser()
     post_parser.add_argument('api_id', type=int, required=True)
     post_parser.add_argument('label', type=iv.str_validation(max=80), required=True)
     post_parser.add_argument('url', type=iv.url_validation('relative_endpoint'), required=True)
@@ -148,13 +234,22 @@ class Endpoints(Resource):
 
 @endpoints_ns.route('/<int:id>')
 class EndpointItem(Resource):
-    @endpoints_ns.doc(description="Get an Endpoint item by id", params={
+    get_parser = sparse_parser.copy()
+    @endpoints_ns.expect(get_parser)
+    @endpoints_ns.doc(description="Get an Endpoint item by id", params=dict({
         'id': "The id of the Endpoint"
-    })
+    }, **SPARSE_PARAMS))
+    @cached(lambda endpoint, id: ['endpoint:%d' % id] + (
+        ['api:%d' % endpoint['api_item']['id']] if 'api_item' in endpoint else []
+    ), parser=get_parser)
     def get(self, id):
-        return JsonMethods.get_endpoint(id)
+        try:
+            schema = requested_schema(EndpointSchema, endpoint_schema, self.get_parser.parse_args())
+        except ValueError as e:
+            return {'status': 'error', 'message': str(e)}, 400
+        return JsonMethods.get_endpoint(id, schema=schema)
 
-    patch_parser = api.parser()
+    patch_parser = reqparse.RequestParser()
     patch_parser.add_argument('label', type=iv.str_validation(max=80), required=False)
     patch_parser.add_argument('url', type=iv.url_validation('relative_endpoint'), required=False)
     patch_parser.add_argument('description', type=iv.str_validation(max=400), required=False)
@@ -182,11 +277,11 @@ class EndpointItem(Resource):
         return JsonMethods.delete_endpoint(id)
 
 fields_ns = Namespace('fields', 'Fields CRUD operations')
-api.add_namespace(fields_ns)
+NAMESPACES.append(fields_ns)
 
 @fields_ns.route('/')
 class Fields(Resource):
-    post_parser = api.parser()
+    post_parser = reqparse.RequestParser()
     post_parser.add_argument('endpoint_id', type=int, required=True)
     post_parser.add_argument('label', type=iv.str_validation(max=80), required=True)
     post_parser.add_argument('field_type', type=str, required=True, choices=Globals.ACCEPTED_FIELD_TYPES)
@@ -220,10 +315,11 @@ class FieldItem(Resource):
     @fields_ns.doc(description="Get a Field item by id", params={
         'id': "The id of the Field"
     })
+    @cached(lambda field, id: ['field:%d' % id])
     def get(self, id):
         return JsonMethods.get_field(id)
 
-    patch_parser = api.parser()
+    patch_parser = reqparse.RequestParser()
     patch_parser.add_argument('label', type=iv.str_validation(max=80), required=False)
     patch_parser.add_argument('field_type', type=str, required=False, choices=Globals.ACCEPTED_FIELD_TYPES)
     patch_parser.add_argument('required', type=str, required=False, choices=Globals.ACCEPTED_FIELD_REQUIRED)
@@ -256,30 +352,223 @@ class FieldItem(Resource):
     def delete(self, id):
         return JsonMethods.delete_field(id)
 
+search_ns = Namespace('search', 'Full text search over APIs, endpoints and fields')
+NAMESPACES.append(search_ns)
+
+@search_ns.route('/')
+class Search(Resource):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument('q', type=str, required=True)
+    get_parser.add_argument('kind', type=str, required=False, choices=['api', 'endpoint', 'field'])
+    get_parser.add_argument('page', type=int, required=False)
+    @search_ns.expect(get_parser)
+    @search_ns.doc(description="Search the catalog by labels, descriptions and urls", params={
+        'q': "The search terms. Each term is matched as a prefix.",
+        'kind': "Restrict the results to one kind of item: api, endpoint or field.",
+        'page': "The requested page of results (page 1 by default)."
+    })
+    def get(self):
+        args = self.get_parser.parse_args()
+        q = args.get('q')
+        kind = args.get('kind')
+        page = args.get('page')
+        return JsonMethods.search(q, kind=kind, page=page)
+
+tags_ns = Namespace('tags', 'Tags of the catalog')
+NAMESPACES.append(tags_ns)
+
+@tags_ns.route('/')
+class Tags(Resource):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument('sort', type=str, required=False, choices=Globals.ACCEPTED_TAG_SORTS)
+    get_parser.add_argument('page', type=int, required=False)
+    @tags_ns.expect(get_parser)
+    @tags_ns.doc(description="Get the tags with the number of APIs and endpoints using them", params={
+        'sort': "text (default) or popular, the most used tags first.",
+        'page': "The requested page of tags (page 1 by default)."
+    })
+    def get(self):
+        args = self.get_parser.parse_args()
+        sort = args.get('sort')
+        page = args.get('page')
+        return JsonMethods.get_tags(sort=sort, page=page)
+
+@tags_ns.route('/suggest')
+class TagSuggestions(Resource):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument('prefix', type=str, required=False)
+    get_parser.add_argument('limit', type=inputs.int_range(1, Globals.MAX_TAG_SUGGESTIONS), required=False)
+    @tags_ns.expect(get_parser)
+    @tags_ns.doc(description="Suggest the most used tags starting with a prefix", params={
+        'prefix': "The beginning of the tag. The most used tags are returned when empty.",
+        'limit': "How many tags to return, %d by default and at most %d." % (
+            Globals.TAG_SUGGESTIONS, Globals.MAX_TAG_SUGGESTIONS
+        )
+    })
+    def get(self):
+        args = self.get_parser.parse_args()
+        prefix = args.get('prefix') or ''
+        limit = args.get('limit') or Globals.TAG_SUGGESTIONS
+        return JsonMethods.suggest_tags(prefix, limit)
+
+bulk_ns = Namespace('bulk', 'Bulk import of APIs with their endpoints and fields')
+NAMESPACES.append(bulk_ns)
+
+BULK_FIELD_RULES = {
+    'label': (iv.str_validation(max=80), True),
+    'field_type': (iv.choice_validation(Globals.ACCEPTED_FIELD_TYPES), True),
+    'required': (iv.choice_validation(Globals.ACCEPTED_FIELD_REQUIRED), False),
+    'default': (iv.str_validation(min=0, max=200), False),
+    'description': (iv.str_validation(min=0, max=400), False)
+}
+
+BULK_ENDPOINT_RULES = {
+    'label': (iv.str_validation(max=80), True),
+    'url': (iv.url_validation('relative_endpoint'), True),
+    'description': (iv.str_validation(min=0, max=400), False),
+    'tags': (iv.str_validation(min=0, max=400), False),
+    'fields': [BULK_FIELD_RULES]
+}
+
+BULK_API_RULES = {
+    'label': (iv.str_validation(max=80), True),
+    'url': (iv.url_validation(type='endpoint'), True),
+    'description': (iv.str_validation(min=0, max=400), False),
+    'tags': (iv.str_validation(min=0, max=400), False),
+    'endpoints': [BULK_ENDPOINT_RULES]
+}
+
+@bulk_ns.route('/')
+class Bulk(Resource):
+    @bulk_ns.doc(description=(
+        "Import APIs with their endpoints, fields and tags. The body is either a JSON object "
+        "holding the list of APIs under \"apis\" or, with the application/x-ndjson content "
+        "type, one API per line. An API has "
+        "label, url, description, tags and endpoints; an endpoint has label, url, description, "
+        "tags and fields; a field has label, field_type, required, default and description. "
+        "Valid APIs are imported by chunks and invalid ones are reported by index."
+    ))
+    def post(self):
+        if request.mimetype == 'application/x-ndjson':
+            documents = iter_ndjson(request.stream)
+        else:
+            body = request.get_json(force=True, silent=True)
+            documents = body.get('apis') if isinstance(body, dict) else None
+            if not isinstance(documents, list):
+                return {'status': 'error', 'message': 'The body must be a JSON object with a list of APIs under "apis"'}
+        return JsonMethods.bulk_import(documents)
+
+export_ns = Namespace('export', 'Export of the whole catalog')
+NAMESPACES.append(export_ns)
+
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+# Columns of the csv export, in order, per entity
+EXPORT_CSV_COLUMNS = {
+    'api': ['id', 'label', 'url', 'description', 'tags'],
+    'endpoint': ['id', 'label', 'url', 'description', 'tags'],
+    'field': ['id', 'label', 'type', 'required', 'default', 'description'],
+}
+
+@export_ns.route('/')
+class Export(Resource):
+    get_parser = reqparse.RequestParser()
+    get_parser.add_argument('format', type=str, required=False, choices=list(EXPORT_MIMETYPES))
+    @export_ns.expect(get_parser)
+    @export_ns.doc(description="Stream the whole catalog", params={
+        'format': "ndjson (default): one API per line, as returned by GET /api/apis/<id>. "
+                  "csv: one row per field, with the columns of its endpoint and API."
+    })
+    def get(self):
+        args = self.get_parser.parse_args()
+        format = args.get('format') or 'ndjson'
+        if format == 'csv':
+            rows = JsonMethods.export_csv()
+        else:
+            rows = JsonMethods.export_ndjson()
+        return Response(
+            stream_with_context(rows), mimetype=EXPORT_MIMETYPES[format],
+            headers={'Content-Disposition': 'attachment; filename=catalog.%s' % format}
+        )
+
 class JsonMethods:
     @staticmethod
-    def get_api(id):
-        api = CRUD.getApi(id)
+    def get_api(id, nested=True, schema=None):
+        if schema is None:
+            schema = api_schema if nested else api_raw_schema
+        api = CRUD.getApi(id, schema=schema)
         if not api: return {}
-        j = api_schema.dump(api)
+        j = fast_dump(schema, api)
         return j
 
     @staticmethod
-    def get_apis(tags=None, page=None):
+    def get_apis(tags=None, page=None, schema=apis_schema):
         if tags:
-            apis = CRUD.getApis(tags=tags)
+            apis = CRUD.getApis(tags=tags, page=page, schema=schema)
         else:
             if page:
-                apis = CRUD.getApis(page=page)
+                apis = CRUD.getApis(page=page, schema=schema)
             else:
-                apis = CRUD.getApis(page=1)
+                apis = CRUD.getApis(page=1, schema=schema)
 
-        j = apis_schema.dump(apis)
+        j = fast_dump(schema, apis)
         return j
 
+    @staticmethod
+    def _decode_cursor(cursor, sort=None):
+        after = None
+        if cursor:
+            sort, after = decode_cursor(cursor)
+        if sort and sort not in Globals.ACCEPTED_SORT_COLUMNS:
+            raise ValueError('%s is not accepted as a sort column' % sort)
+        if sort == 'id':
+            sort = None
+        return sort, after
+
+    @staticmethod
+    def get_apis_after(cursor, sort=None, schema=apis_schema):
+        """Raises ValueError for an invalid cursor or sort."""
+        sort, after = JsonMethods._decode_cursor(cursor, sort)
+        apis, next_key = CRUD.getApisAfter(after=after, sort=sort, schema=schema)
+        return {
+            'items': fast_dump(schema, apis),
+            'next_cursor': encode_cursor(sort, next_key) if next_key else None
+        }
+
+    @staticmethod
+    def export_ndjson():
+        for api in CRUD.streamApis(schema=api_schema):
+            yield json.dumps(fast_dump(api_schema, api)) + '\n'
+
+    @staticmethod
+    def export_csv():
+        columns = ['%s_%s' % (entity, k) for entity, keys in EXPORT_CSV_COLUMNS.items() for k in keys]
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, restval='', extrasaction='ignore')
+
+        def flush():
+            data = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return data
+
+        writer.writeheader()
+        yield flush()
+        for api in CRUD.streamApis(schema=api_schema):
+            j = fast_dump(api_schema, api)
+            j['tags'] = ' '.join(j['tags'])
+            for endpoint in j['endpoints']:
+                endpoint['tags'] = ' '.join(endpoint['tags'])
+            rows = [
+                {'api': j, 'endpoint': endpoint, 'field': field}
+                for endpoint in j['endpoints'] for field in endpoint['fields_list'] or [{}]
+            ] or [{'api': j}]
+            for row in rows:
+                writer.writerow(flatten_json(row, exclude=['endpoints', 'api_item', 'fields_list']))
+            yield flush()
+
     @staticmethod
     def get_apis_count():
-        return {'count': ApiItem.query.count()}
+        return {'count': CRUD.getCount(ApiItem.__tablename__)}
 
     @staticmethod
     def delete_api(id):
@@ -337,30 +626,44 @@ class JsonMethods:
             }
 
     @staticmethod
-    def get_endpoint(id):
-        endpoint = CRUD.getEndpoint(id)
-        j = endpoint_schema.dump(endpoint)
+    def get_endpoint(id, schema=endpoint_schema):
+        endpoint = CRUD.getEndpoint(id, schema=schema)
+        if not endpoint: return {}
+        j = fast_dump(schema, endpoint)
         return j
 
     @staticmethod
-    def get_endpoints(api_id=None, page=None, tags=None):
+    def get_endpoints(api_id=None, page=None, tags=None, schema=endpoints_schema):
         if api_id:
-            api = CRUD.getApi(api_id)
-            endpoints = api.endpoints
+            endpoints = CRUD.getApiEndpoints(api_id, page=page, schema=schema)
         elif tags:
-            endpoints = CRUD.getEndpoints(tags=tags)
+            endpoints = CRUD.getEndpoints(tags=tags, page=page, schema=schema)
         else:
             if page:
-                endpoints = CRUD.getEndpoints(page=page)
+                endpoints = CRUD.getEndpoints(page=page, schema=schema)
             else:
-                endpoints = CRUD.getEndpoints(page=1)
+                endpoints = CRUD.getEndpoints(page=1, schema=schema)
 
-        j = endpoints_schema.dump(endpoints)
+        j = fast_dump(schema, endpoints)
         return j
 
+    @staticmethod
+    def get_endpoints_after(cursor, sort=None, api_id=None, schema=endpoints_schema):
+        """Raises ValueError for an invalid cursor or sort."""
+        sort, after = JsonMethods._decode_cursor(cursor, sort)
+        endpoints, next_key = CRUD.getEndpointsAfter(after=after, sort=sort, api_id=api_id, schema=schema)
+        return {
+            'items': fast_dump(schema, endpoints),
+            'next_cursor': encode_cursor(sort, next_key) if next_key else None
+        }
+
     @staticmethod
     def get_endpoints_count():
-        return {'count': Endpoint.query.count()}
+        return {'count': CRUD.getCount(Endpoint.__tablename__)}
+
+    @staticmethod
+    def get_api_endpoints_count(api_id):
+        return {'count': CRUD.countApiEndpoints(api_id)}
 
     @staticmethod
     def add_endpoint(api_id, label, url, description=None, tags=None):
@@ -420,11 +723,79 @@ class JsonMethods:
                 'id': id
             }
 
+    @staticmethod
+    def search(q, kind=None, page=None):
+        results = CRUD.searchCatalog(q, kind=kind, page=page)
+        return [
+            {
+                'kind': r['kind'], 'id': r['item_id'], 'label': r['label'],
+                'description': r['description'], 'url': r['url'], 'rank': r['rank']
+            } for r in results
+        ]
+
+    @staticmethod
+    def get_tags(sort=None, page=None):
+        return [
+            {'id': id, 'text': text, 'api_items': api_items, 'endpoints': endpoints, 'uses': uses}
+            for id, text, api_items, endpoints, uses in CRUD.getTagUsage(sort=sort, page=page)
+        ]
+
+    @staticmethod
+    def suggest_tags(prefix, limit):
+        suggestions = current_app.extensions['tag_index'].suggest(prefix, limit)
+        return [{'text': text, 'uses': uses} for text, uses in suggestions]
+
+    @staticmethod
+    def bulk_import(documents):
+        ids, errors = [], []
+        chunk, indexes = [], []
+
+        def import_chunk():
+            new_ids = CRUD.addApisBulk(chunk, commit=True)
+            if new_ids is None:
+                errors.extend({
+                    'index': i,
+                    'errors': {'document': 'Ooops! Something went wrong while importing this API'}
+                } for i in indexes)
+            else:
+                ids.extend(new_ids)
+            chunk.clear()
+            indexes.clear()
+
+        for index, document in enumerate(documents):
+            if isinstance(document, ValueError):
+                errors.append({'index': index, 'errors': {'document': str(document)}})
+                continue
+            clean, document_errors = iv.document_validation(document, BULK_API_RULES)
+            if document_errors:
+                errors.append({'index': index, 'errors': document_errors})
+                continue
+
+            for endpoint in clean['endpoints']:
+                endpoint['fields'] = [{
+                    'label': f['label'], 'type_field': f['field_type'],
+                    'required': f.get('required') == 'yes',
+                    'default': f.get('default', ''), 'description': f.get('description', '')
+                } for f in endpoint['fields']]
+            chunk.append(clean)
+            indexes.append(index)
+            if len(chunk) >= Globals.BULK_CHUNK_SIZE:
+                import_chunk()
+        if chunk:
+            import_chunk()
+
+        return {
+            'status': 'error' if errors else 'ok',
+            'message': '%d APIs were imported, %d were rejected' % (len(ids), len(errors)),
+            'ids': ids,
+            'errors': errors
+        }
+
     @staticmethod
     def get_field(id):
         field = CRUD.getField(id)
         if not field: return {}
-        j = field_schema.dump(field)
+        j = fast_dump(field_schema, field)
         return j
 
     @staticmethod
@@ -1,70 +1,151 @@
-import logging, os
+import random
+import click
 
-from flask import Flask, redirect, url_for, request, send_from_directory, flash
-from flask_migrate import Migrate
+from flask import Flask, redirect, url_for, request, flash
+from flask.cli import AppGroup
 from flask_wtf.csrf import CSRFError
 
 from extensions import csrf
+from assets import StaticAssets
+from cache import ResponseCache
+from compression import Compress
+from metrics import Metrics
+from tag_index import TagIndex
 from models import db, security, user_datastore
 from schemas import ma
-from api import api
+from api import init_api
+from crud import CRUD
 from views import views
 from utils import list_obj_stringify
-from admin import admin
-from config import BaseConfig
-
-app = Flask(__name__)
-app.config.from_object('config.BaseConfig')
-db.init_app(app)
-ma.init_app(app)
-security_state = security.init_app(app, user_datastore)
-security._state = security_state
-csrf.init_app(app)
-admin.init_app(app)
-
-#Migartion Part
-"""Needs to add in migrations/env.py in context.configure
-after flask db init: render_as_batch=True,
-to enable sqlite droping tables"""
-migrate = Migrate(app, db)
-
-#registering views and APIs
-app.register_blueprint(views)
-api.init_app(app)
-
-#Handling Faviocn requests
-@app.route('/favicon.ico')
-def favicon():
-    return send_from_directory(
-        os.path.join(app.root_path, 'static'),
-        'favicon.ico', mimetype='image/vnd.microsoft.icon'
-    )
-
-#Creating a 404 template
-@app.errorhandler(404)
-def not_found(error):
-    return redirect('/')
-
-#Handling CSRF errors
-@app.errorhandler(CSRFError)
-def csrf_error(reason):
-    flash('You have been logged out. Please login again!')
-    return redirect(url_for('security.logout'))
-
-#registering Jinja Filters
-app.jinja_env.filters['list_obj_stringify'] = list_obj_stringify
-
-# Logging section
-fileHandler = logging.FileHandler(BaseConfig.GLOBAL_LOG_FILE)
-fileHandler.setFormatter(
-    logging.Formatter("%(asctime)s: %(levelname)s: %(message)s")
-)
-app.logger.propagate = False
-app.logger.setLevel(logging.DEBUG)
-app.logger.addHandler(fileHandler)
-@app.before_request
-def logg_request():
-    app.logger.debug('%s - %s' % (request.remote_addr, request.url))
+from logs import init_logging
+from database import init_engine, init_query_stats
+from fragments import FragmentCacheExtension
+from template_cache import init_template_cache, compile_templates
+
+def create_app(config=None):
+    """Builds the application from config.BaseConfig, updated with config:
+    a config object, its import path or a dict of overrides.
+
+    The admin area, the Swagger documentation and the migration commands
+    can be left out through ADMIN_ENABLED, SWAGGER_ENABLED and
+    MIGRATIONS_ENABLED, and their modules are only imported when they are
+    used. By default, migrations are only set up for the flask command."""
+    app = Flask(__name__)
+    app.config.from_object('config.BaseConfig')
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # Extensions keeping state are built for every app, and found through
+    # app.extensions by the code running in a request
+    response_cache = ResponseCache()
+    Compress(app, cache=response_cache)
+    db.init_app(app)
+    init_engine(app)
+    init_query_stats(app)
+    ma.init_app(app)
+    security_state = security.init_app(app, user_datastore)
+    security._state = security_state
+    csrf.init_app(app)
+    response_cache.init_app(app)
+    assets = StaticAssets(app)
+    TagIndex(app)
+    if app.config['ADMIN_ENABLED']:
+        from admin import init_admin
+        init_admin(app)
+
+    #Migartion Part
+    """Needs to add in migrations/env.py in context.configure
+    after flask db init: render_as_batch=True,
+    to enable sqlite droping tables"""
+    migrations = app.config['MIGRATIONS_ENABLED']
+    if migrations is None:
+        migrations = click.get_current_context(silent=True) is not None
+    if migrations:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    #registering views and APIs
+    app.register_blueprint(views)
+    api = init_api(app)
+    Metrics(app, api=api, db=db, cache=response_cache)
+
+    #Handling Faviocn requests
+    @app.route('/favicon.ico')
+    def favicon():
+        return assets.send_file('favicon.ico', app.config['STATIC_MAX_AGE'])
+
+    #Creating a 404 template
+    @app.errorhandler(404)
+    def not_found(error):
+        return redirect('/')
+
+    #Handling CSRF errors
+    @app.errorhandler(CSRFError)
+    def csrf_error(reason):
+        flash('You have been logged out. Please login again!')
+        return redirect(url_for('security.logout'))
+
+    #Maintenance commands
+    counters_cli = AppGroup('counters', help='Manage the entity counters.')
+    @counters_cli.command('reconcile')
+    def reconcile_counters():
+        """Recompute the entity counters from their tables."""
+        corrected = CRUD.reconcileCounters(commit=True)
+        click.echo('Corrected counters: %s' % (', '.join(corrected) or 'none'))
+    app.cli.add_command(counters_cli)
+
+    tags_cli = AppGroup('tags', help='Manage the tags and their usage counts.')
+    @tags_cli.command('reconcile')
+    def reconcile_tag_usage():
+        """Recompute the tag usage counts from the associations."""
+        corrected = CRUD.reconcileTagUsage(commit=True)
+        click.echo('Corrected tag usage counts: %d' % corrected)
+    @tags_cli.command('prune')
+    def prune_tags():
+        """Delete the tags no API or endpoint uses."""
+        deleted = CRUD.deleteUnusedTags(commit=True)
+        click.echo('Deleted tags: %s' % (', '.join(deleted) or 'none'))
+    app.cli.add_command(tags_cli)
+
+    templates_cli = AppGroup('templates', help='Manage the compiled templates.')
+    @templates_cli.command('compile')
+    def compile_templates_command():
+        """Compile every template into the bytecode cache."""
+        if app.jinja_env.bytecode_cache is None:
+            raise click.ClickException('TEMPLATE_CACHE_DIR is not set.')
+        compiled, errors = compile_templates(app)
+        for name, error in errors.items():
+            click.echo('%s: %s' % (name, error), err=True)
+        click.echo('Compiled %d templates into %s' % (len(compiled), app.config['TEMPLATE_CACHE_DIR']))
+        if errors:
+            raise click.ClickException('%d templates failed to compile.' % len(errors))
+    app.cli.add_command(templates_cli)
+
+    assets_cli = AppGroup('assets', help='Manage the static files.')
+    @assets_cli.command('compress')
+    def compress_assets():
+        """Write the precompressed variants of the static files."""
+        written = assets.compress()
+        click.echo('Compressed files: %s' % (', '.join(written) or 'none'))
+    app.cli.add_command(assets_cli)
+
+    #registering Jinja Filters and Extensions
+    app.jinja_env.filters['list_obj_stringify'] = list_obj_stringify
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    init_template_cache(app)
+
+    # Logging section
+    app.extensions['log_listener'] = init_logging(app)
+    @app.before_request
+    def logg_request():
+        if random.random() < app.config['LOG_REQUEST_SAMPLE_RATE']:
+            app.logger.debug('%s - %s' % (request.remote_addr, request.url), extra={
+                'remote_addr': request.remote_addr, 'method': request.method, 'url': request.url
+            })
+
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
@@ -0,0 +1,123 @@
+import gzip, mimetypes, os
+from hashlib import md5
+
+from flask import current_app, request, safe_join, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Types worth compressing, the others are already compressed
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/xml',
+    'image/svg+xml', 'image/vnd.microsoft.icon', 'image/x-icon'
+)
+# Content-Encoding: file extension, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+def compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or ''
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+class StaticAssets:
+    """Serves the static folder with fingerprinted URLs: url_for('static',
+    filename='favicon.ico') returns /static/favicon.<hash>.ico, whose content
+    never changes and which is cached as immutable for a year. Other static
+    URLs are cached for STATIC_MAX_AGE only.
+
+    Files with a .br or .gz variant next to them, written by
+    "flask assets compress", are served compressed to the clients accepting
+    the encoding. Fingerprinting is disabled in debug mode, where files
+    change while the app runs."""
+    def __init__(self, app=None):
+        self.hashed = {}
+        self.originals = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.static_folder
+        self.build_manifest()
+        app.url_defaults(self._hash_url)
+        app.view_functions['static'] = self.send_static_file
+        app.extensions['static_assets'] = self
+
+    def files(self):
+        """Yields the path of every file of the static folder, relative to it,
+        leaving out the compressed variants."""
+        for root, _, names in os.walk(self.folder):
+            for name in names:
+                if not name.endswith(tuple(ext for _, ext in ENCODINGS)):
+                    yield os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, '/')
+
+    def build_manifest(self):
+        self.hashed, self.originals = {}, {}
+        if not self.folder or not os.path.isdir(self.folder):
+            return
+        for filename in self.files():
+            with open(os.path.join(self.folder, filename), 'rb') as f:
+                digest = md5(f.read()).hexdigest()[:12]
+            base, ext = os.path.splitext(filename)
+            hashed = '%s.%s%s' % (base, digest, ext)
+            self.hashed[filename] = hashed
+            self.originals[hashed] = filename
+
+    def _hash_url(self, endpoint, values):
+        if endpoint == 'static' and not current_app.debug:
+            filename = values.get('filename')
+            values['filename'] = self.hashed.get(filename, filename)
+
+    @staticmethod
+    def _fresh(path, variant):
+        try:
+            return os.path.getmtime(variant) >= os.path.getmtime(path)
+        except OSError:
+            return False
+
+    def send_file(self, filename, max_age, immutable=False):
+        """Sends filename of the static folder, or its variant in the best
+        encoding the client accepts."""
+        headers = {}
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        path = safe_join(self.folder, filename)
+        variants = [(e, ext) for e, ext in ENCODINGS if self._fresh(path, path + ext)]
+        for encoding, ext in variants:
+            if request.accept_encodings[encoding]:
+                filename += ext
+                headers['Content-Encoding'] = encoding
+                break
+        response = send_from_directory(self.folder, filename, mimetype=mimetype, cache_timeout=max_age)
+        response.headers.update(headers)
+        if variants:
+            response.vary.add('Accept-Encoding')
+        if immutable:
+            response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % max_age
+        return response
+
+    def send_static_file(self, filename):
+        original = self.originals.get(filename)
+        if original is not None:
+            return self.send_file(original, current_app.config['STATIC_IMMUTABLE_MAX_AGE'], immutable=True)
+        return self.send_file(filename, current_app.config['STATIC_MAX_AGE'])
+
+    def compress(self, min_size=256):
+        """Writes the .gz, and with the brotli package the .br, variants of
+        the compressible static files of at least min_size bytes, when they
+        are smaller than the file. Returns the paths written."""
+        written = []
+        for filename in self.files():
+            path = os.path.join(self.folder, filename)
+            if not compressible(filename) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = [('.gz', gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', brotli.compress(data, quality=11)))
+            for ext, compressed in variants:
+                if len(compressed) < len(data):
+                    with open(path + ext, 'wb') as f:
+                        f.write(compressed)
+                    written.append(filename + ext)
+        return written
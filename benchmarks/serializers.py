@@ -0,0 +1,52 @@
+"""Compares schema.dump with the compiled serializers on large pages of
+unsaved objects, so that no database is involved.
+
+    python -m benchmarks.serializers [--apis 500] [--repeat 5]
+"""
+import argparse, json, random, timeit
+
+from models import ApiItem, Endpoint, Field, Tag
+from schemas import apis_schema, endpoints_schema
+from serializers import fast_dump
+from utils import generate_random_string
+
+def build_catalog(n_apis, n_endpoints=5, n_fields=4, n_tags=30):
+    tags = [Tag(id=i, text=generate_random_string()) for i in range(1, n_tags + 1)]
+    apis = []
+    for i in range(1, n_apis + 1):
+        api = ApiItem(
+            id=i, label=generate_random_string(), url=generate_random_string(),
+            description=generate_random_string(40), tags=random.sample(tags, 3)
+        )
+        for j in range(n_endpoints):
+            endpoint = Endpoint(
+                id=i * n_endpoints + j, label=generate_random_string(), url=generate_random_string(),
+                description=generate_random_string(40), tags=random.sample(tags, 2), api_item=api
+            )
+            for k in range(n_fields):
+                endpoint.fields.append(Field(
+                    id=(i * n_endpoints + j) * n_fields + k, label=generate_random_string(),
+                    type='string', description=generate_random_string(20), default='',
+                    required=random.choice([True, False, None]), endpoint_id=endpoint.id
+                ))
+        apis.append(api)
+    return apis
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--apis', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    apis = build_catalog(args.apis)
+    endpoints = [endpoint for api in apis for endpoint in api.endpoints]
+    for name, schema, items in [('apis', apis_schema, apis), ('endpoints', endpoints_schema, endpoints)]:
+        assert json.dumps(fast_dump(schema, items)) == json.dumps(schema.dump(items))
+        marshmallow = min(timeit.repeat(lambda: schema.dump(items), number=1, repeat=args.repeat))
+        compiled = min(timeit.repeat(lambda: fast_dump(schema, items), number=1, repeat=args.repeat))
+        print('%-10s %6d items  marshmallow %8.1f ms  compiled %8.1f ms  x%.1f' % (
+            name, len(items), marshmallow * 1000, compiled * 1000, marshmallow / compiled
+        ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Measures the cold start of the application, from a fresh interpreter
+importing app to a built application, and the time create_app takes once
+the modules are imported, as in tests creating an app per test, then the
+first requests of a new worker to the HTML pages, with and without the
+templates precompiled into the bytecode cache.
+
+    python -m benchmarks.startup [--runs 5] [--output results.json]
+"""
+import argparse, json, os, shutil, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEAN = {'ADMIN_ENABLED': False, 'SWAGGER_ENABLED': False, 'MIGRATIONS_ENABLED': False}
+
+COLD_START = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(json.loads(sys.argv[1]))
+print(json.dumps([imported - start, time.perf_counter() - imported]))
+'''
+
+PAGES = ['/', '/endpoints', '/add', '/search?tags=api']
+
+FIRST_REQUESTS = '''
+import json, sys, time
+from app import create_app
+client = create_app(json.loads(sys.argv[1])).test_client()
+timings = []
+for _ in range(2):
+    start = time.perf_counter()
+    for url in json.loads(sys.argv[2]):
+        assert client.get(url).status_code == 200, url
+    timings.append(time.perf_counter() - start)
+print(json.dumps(timings))
+'''
+
+def cold_start(config, runs):
+    imports, creations = [], []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', COLD_START, json.dumps(config)], cwd=ROOT, stderr=subprocess.DEVNULL
+        )
+        imported, created = json.loads(output.decode().strip().splitlines()[-1])
+        imports.append(imported * 1000)
+        creations.append(created * 1000)
+    return {
+        'import_ms': round(statistics.median(imports), 1),
+        'create_ms': round(statistics.median(creations), 1),
+        'total_ms': round(statistics.median(i + c for i, c in zip(imports, creations)), 1)
+    }
+
+def warm_create(config, runs):
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    create_app(config)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app(config)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'create_ms': round(statistics.median(timings), 1)}
+
+def first_requests(runs):
+    """Times the first and the second round of PAGES in a new process, whose
+    templates are compiled on first use or loaded from a bytecode cache
+    filled beforehand."""
+    directory = tempfile.mkdtemp()
+    try:
+        configs = [
+            ('compiled on use', {'TEMPLATE_CACHE_DIR': None}),
+            ('precompiled', {'TEMPLATE_CACHE_DIR': directory})
+        ]
+        subprocess.check_call(
+            [sys.executable, '-m', 'flask', 'templates', 'compile'], cwd=ROOT, stdout=subprocess.DEVNULL,
+            env=dict(os.environ, FLASK_APP='wsgi.py', TEMPLATE_CACHE_DIR=directory)
+        )
+        results = {}
+        for name, config in configs:
+            # without the response cache, the second round only differs by warm templates
+            config = dict(config, RESPONSE_CACHE_BACKEND='null', LOG_REQUEST_SAMPLE_RATE=0)
+            first, second = [], []
+            for _ in range(runs):
+                output = subprocess.check_output(
+                    [sys.executable, '-c', FIRST_REQUESTS, json.dumps(config), json.dumps(PAGES)],
+                    cwd=ROOT, stderr=subprocess.DEVNULL
+                )
+                timings = json.loads(output.decode().strip().splitlines()[-1])
+                first.append(timings[0] * 1000)
+                second.append(timings[1] * 1000)
+            results[name] = {
+                'first_ms': round(statistics.median(first), 1),
+                'warm_ms': round(statistics.median(second), 1)
+            }
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    results = {}
+    for name, config in [('default', {}), ('lean', LEAN)]:
+        results[name] = {
+            'cold': cold_start(config, args.runs),
+            'warm': warm_create(config, args.runs * 4)
+        }
+        print('%-8s cold start %7.1f ms (import %7.1f ms)  create_app %6.1f ms' % (
+            name, results[name]['cold']['total_ms'], results[name]['cold']['import_ms'],
+            results[name]['warm']['create_ms']
+        ))
+
+    results['first_requests'] = first_requests(args.runs)
+    for name, timings in results['first_requests'].items():
+        print('%-16s first requests %7.1f ms  warm %7.1f ms' % (name, timings['first_ms'], timings['warm_ms']))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
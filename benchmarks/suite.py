@@ -0,0 +1,196 @@
+"""Times the CRUD layer, the REST API and the HTML views on a synthetic
+catalog seeded in a copy of api.db, and writes the results as JSON so that
+runs can be compared across commits.
+
+    python -m benchmarks.suite [--apis 500] [--requests 50] [--output results.json]
+"""
+import argparse, json, os, random, shutil, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))
+    return values[index]
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class QueryCounter:
+    """Counts the statements sent to the engine."""
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.increment)
+
+    def increment(self, *args):
+        self.count += 1
+
+def build_documents(n_apis, n_endpoints, n_fields, tags):
+    from utils import generate_random_string
+    return [{
+        'label': generate_random_string(), 'url': 'https://%s.com' % generate_random_string(),
+        'description': ' '.join(generate_random_string() for _ in range(8)),
+        'tags': ' '.join(random.sample(tags, 3)),
+        'endpoints': [{
+            'label': generate_random_string(), 'url': '/%s' % generate_random_string(),
+            'description': ' '.join(generate_random_string() for _ in range(5)),
+            'tags': ' '.join(random.sample(tags, 2)),
+            'fields': [{
+                'label': generate_random_string(), 'field_type': 'string',
+                'description': generate_random_string(20), 'default': '',
+                'required': random.choice(['yes', 'no'])
+            } for _ in range(n_fields)]
+        } for _ in range(n_endpoints)]
+    } for _ in range(n_apis)]
+
+class Suite:
+    def __init__(self, app, db, args):
+        self.app = app
+        self.db = db
+        self.args = args
+        self.client = app.test_client()
+        self.counter = QueryCounter(db.get_engine(app))
+        self.results = {}
+
+    def measure(self, name, call, args_list):
+        """Runs call with the first --requests items of args_list, recording
+        the latency and the number of queries of each call, then with the
+        remaining items under tracemalloc to get the peak memory."""
+        latencies, queries = [], []
+        for args in args_list[:self.args.requests]:
+            self.db.session.remove()
+            before = self.counter.count
+            start = time.perf_counter()
+            call(*args)
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(self.counter.count - before)
+
+        peak = 0
+        for args in args_list[self.args.requests:]:
+            self.db.session.remove()
+            tracemalloc.start()
+            call(*args)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        self.results[name] = {
+            'calls': len(latencies),
+            'latency_ms': {
+                'mean': round(statistics.mean(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p90': round(percentile(latencies, 90), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(max(latencies), 3)
+            },
+            'queries': {'mean': round(statistics.mean(queries), 2), 'max': max(queries)},
+            'peak_memory_kb': round(peak / 1024, 1)
+        }
+        print('%-16s p50 %8.2f ms  p99 %8.2f ms  %6.1f queries  %8.1f KB' % (
+            name, self.results[name]['latency_ms']['p50'], self.results[name]['latency_ms']['p99'],
+            self.results[name]['queries']['mean'], self.results[name]['peak_memory_kb']
+        ))
+
+    def get(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+
+    def write(self, method, url, **kwargs):
+        response = self.client.open(url, method=method, **kwargs)
+        assert response.json.get('status') == 'ok', (url, response.json)
+
+    def run(self):
+        from api import JsonMethods
+        from config import Globals
+        from models import ApiItem, Tag
+        from utils import generate_random_string
+
+        args = self.args
+        samples = args.requests + args.memory_samples
+        tags = [generate_random_string() for _ in range(args.tags)]
+
+        # Seeding, itself timed as the bulk creation of the whole catalog
+        documents = build_documents(args.apis, args.endpoints, args.fields, tags)
+        start = time.perf_counter()
+        assert not JsonMethods.bulk_import(documents)['errors']
+        self.results['seed'] = {'apis': args.apis, 'seconds': round(time.perf_counter() - start, 3)}
+        print('%-16s %8.2f s' % ('seed', self.results['seed']['seconds']))
+
+        api_ids = [id for id, in self.db.session.query(ApiItem.id).all()]
+        pages = max(1, len(api_ids) // Globals.ITEM_PER_PAGE)
+        tag_texts = [t for t, in self.db.session.query(Tag.text).all()]
+        random_pages = [(random.randint(1, pages),) for _ in range(samples)]
+        random_tags = [(' '.join(random.sample(tag_texts, 2)),) for _ in range(samples)]
+
+        self.measure('get_apis', lambda page: JsonMethods.get_apis(page=page), random_pages)
+        self.measure('api_apis', lambda page: self.get('/api/apis/?page=%d' % page), random_pages)
+        self.measure('tag_search', lambda tags: self.get('/search?tags=%s' % tags), random_tags)
+        self.measure('api_tag_search', lambda tags: self.get('/api/apis/?tags=%s' % tags), random_tags)
+        # the same few searches over and over, in any word order
+        popular_tags = [random.choice(random_tags[:5])[0].split() for _ in range(samples)]
+        self.measure('hot_tag_search', lambda tags: self.get('/api/apis/?tags=%s' % tags), [
+            (' '.join(random.sample(tags, len(tags))),) for tags in popular_tags
+        ])
+        self.measure('detail_api', lambda id: self.get('/%d' % id), [(random.choice(api_ids),) for _ in range(samples)])
+        self.measure('tags_popular', lambda: self.get('/api/tags/?sort=popular'), [() for _ in range(samples)])
+        self.measure('tag_suggest', lambda tags: self.get('/api/tags/suggest?prefix=%s' % tags[:2]), random_tags)
+        self.measure('list_endpoints', lambda page: self.get('/endpoints?page=%d' % page), random_pages)
+
+        new_documents = build_documents(samples * args.bulk_size, args.endpoints, args.fields, tags)
+        self.measure('bulk_create', lambda chunk: self.write('POST', '/api/bulk/', json={'apis': chunk}), [
+            (new_documents[i:i + args.bulk_size],) for i in range(0, len(new_documents), args.bulk_size)
+        ])
+        self.measure('delete_api', lambda id: self.write('DELETE', '/api/apis/%d' % id), [
+            (id,) for id in random.sample(api_ids, min(samples, len(api_ids)))
+        ])
+        return self.results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--apis', type=int, default=500, help='APIs seeded in the catalog')
+    parser.add_argument('--endpoints', type=int, default=5, help='endpoints per API')
+    parser.add_argument('--fields', type=int, default=4, help='fields per endpoint')
+    parser.add_argument('--tags', type=int, default=50, help='distinct tags used by the catalog')
+    parser.add_argument('--requests', type=int, default=50, help='timed calls per scenario')
+    parser.add_argument('--memory-samples', type=int, default=3, help='extra calls run under tracemalloc')
+    parser.add_argument('--bulk-size', type=int, default=20, help='APIs per bulk creation request')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response and fragment caches')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file receiving the results')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    directory = tempfile.mkdtemp()
+    shutil.copy(os.path.join(ROOT, 'api.db'), os.path.join(directory, 'api.db'))
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'api.db')
+    sys.path.insert(0, ROOT)
+    try:
+        from app import create_app
+        from models import db
+        app = create_app({
+            'LOG_REQUEST_SAMPLE_RATE': 0,
+            'RESPONSE_CACHE_BACKEND': 'null' if args.no_cache else 'lru'
+        })
+        with app.app_context():
+            results = Suite(app, db, args).run()
+    finally:
+        shutil.rmtree(directory)
+
+    report = {
+        'commit': git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'parameters': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+import os, pickle, tempfile, threading, time, uuid
+from collections import OrderedDict
+from functools import wraps
+from hashlib import sha1
+
+from flask import current_app, request, Response
+from flask_restx.representations import output_json
+
+def _expires(ttl):
+    return time.time() + ttl if ttl else None
+
+def _expired(expires):
+    return expires is not None and expires <= time.time()
+
+class LRUBackend:
+    """In-process cache keeping at most max_entries items, dropping the least
+    recently used ones first. Items expire ttl seconds after being set, so
+    that a process does not serve indefinitely what the others changed."""
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if _expired(item[0]):
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (_expires(self.ttl), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+class FileSystemBackend:
+    """Cache stored as one pickle file per key, which can be shared by all
+    the workers of a host. Items expire ttl seconds after being set and,
+    beyond max_entries files, the oldest files are removed."""
+    def __init__(self, directory, max_entries=None, ttl=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, sha1(key.encode()).hexdigest())
+
+    def _load(self, path):
+        try:
+            with open(path, 'rb') as f:
+                item = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # files written before expiry times were stored are misses
+        return item if isinstance(item, tuple) else None
+
+    def get(self, key):
+        path = self._path(key)
+        item = self._load(path)
+        if item is None:
+            return None
+        if _expired(item[0]):
+            self._remove(path)
+            return None
+        return item[1]
+
+    def set(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((_expires(self.ttl), value), f)
+        os.replace(tmp, self._path(key))
+        if self.max_entries is not None:
+            self._prune()
+
+    def _prune(self):
+        # With a single ttl, the oldest files are also the first to expire
+        paths = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if not name.startswith('.')
+        ]
+        excess = len(paths) - self.max_entries
+        if excess > 0:
+            for path in sorted(paths, key=self._mtime)[:excess]:
+                self._remove(path)
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+class NullBackend:
+    """Disables caching."""
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+# Cache tag whose version is the generation of the search results: any
+# change to a label, to tags or to their associations bumps it
+SEARCH_TAG = 'search'
+
+class ResponseCache:
+    """Caches serialized JSON responses along with a strong ETag.
+
+    Every entry is stored with the tags it depends on (e.g. "api:3") and the
+    version of each tag at the time it was stored. Invalidating a tag gives
+    it a new version, so that the entries depending on it are ignored from
+    then on. Versions live in the backend itself, which keeps invalidation
+    consistent across processes with a shared backend.
+
+    Every invalidation also changes the generation. Callers take it with
+    generation() before computing what they store and pass it to the set
+    methods, which store nothing when it changed in between: the computed
+    value may predate the write, and would otherwise be stored under the
+    versions following it."""
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.hits = 0
+        self.misses = 0
+        self.search_hits = 0
+        self.search_misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('RESPONSE_CACHE_BACKEND', 'lru')
+        max_entries = app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        ttl = app.config.get('RESPONSE_CACHE_TTL')
+        if backend == 'lru':
+            self.backend = LRUBackend(max_entries, ttl=ttl)
+        elif backend == 'filesystem':
+            self.backend = FileSystemBackend(app.config['RESPONSE_CACHE_DIR'], max_entries, ttl=ttl)
+        else:
+            self.backend = NullBackend()
+        app.extensions['response_cache'] = self
+
+    def _tag_version(self, tag, create=False):
+        version = self.backend.get('tag:' + tag)
+        if version is None and create:
+            version = uuid.uuid4().hex
+            self.backend.set('tag:' + tag, version)
+        return version
+
+    def _fresh(self, entry):
+        if entry is None:
+            return None
+        for tag, version in entry['tags'].items():
+            if self._tag_version(tag) != version:
+                return None
+        return entry
+
+    def _versions(self, tags):
+        return {tag: self._tag_version(tag, create=True) for tag in tags}
+
+    def generation(self):
+        return self.backend.get('generation')
+
+    def _store(self, key, entry, tags, generation):
+        # versions are read before checking the generation, which
+        # invalidate changes before the versions
+        entry['tags'] = self._versions(tags)
+        if self.generation() == generation:
+            self.backend.set(key, entry)
+
+    def get(self, key):
+        return self._fresh(self.backend.get('response:' + key))
+
+    def set(self, key, body, tags, generation):
+        entry = {'body': body, 'etag': sha1(body).hexdigest()}
+        self._store('response:' + key, entry, tags, generation)
+        return entry
+
+    def get_fragment(self, key):
+        entry = self._fresh(self.backend.get('fragment:' + key))
+        return entry and entry['html']
+
+    def set_fragment(self, key, html, tags, generation):
+        """Stores a rendered template fragment, tagged like responses."""
+        self._store('fragment:' + key, {'html': html}, tags, generation)
+
+    def get_search(self, key):
+        """Returns the ranked ids stored for a search, when no write changed
+        the search results since."""
+        entry = self._fresh(self.backend.get('search:' + key))
+        if entry is None:
+            self.search_misses += 1
+            return None
+        self.search_hits += 1
+        return entry['ids']
+
+    def set_search(self, key, ids, generation):
+        self._store('search:' + key, {'ids': ids}, [SEARCH_TAG], generation)
+
+    def get_variant(self, etag, encoding):
+        entry = self.backend.get('variant:%s:%s' % (encoding, etag))
+        return entry and entry['body']
+
+    def set_variant(self, etag, encoding, body):
+        """Stores the body of the response with the strong ETag etag,
+        compressed with encoding. The ETag identifies the body, so variants
+        need no tags and are only dropped by the backend."""
+        self.backend.set('variant:%s:%s' % (encoding, etag), {'body': body})
+
+    def invalidate(self, *tags):
+        self.backend.set('generation', uuid.uuid4().hex)
+        for tag in tags:
+            self.backend.set('tag:' + tag, uuid.uuid4().hex)
+
+    def clear(self):
+        self.backend.clear()
+
+def cached(tags, parser=None):
+    """Decorates a resource method returning a dict. Responses are cached, in
+    the response cache of the current app, by path and by the query args
+    parser recognizes, tagged with tags(data, **view_args), and served with
+    an ETag so that a matching If-None-Match gets a 304 without the body
+    being rebuilt. Empty results (not found items) and responses returned
+    with a status code, such as errors, are not cached."""
+    names = set(arg.name for arg in parser.args) if parser is not None else set()
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions['response_cache']
+            key = '%s?%s' % (request.path, '&'.join(sorted(
+                '%s=%s' % (k, v) for k, v in request.args.items(multi=True) if k in names
+            )))
+            entry = cache.get(key)
+            if entry is None:
+                cache.misses += 1
+                generation = cache.generation()
+                data = f(*args, **kwargs)
+                if not data or isinstance(data, tuple):
+                    return data
+                body = output_json(data, 200).get_data()
+                entry = cache.set(key, body, tags(data, **kwargs), generation)
+            else:
+                cache.hits += 1
+
+            response = Response(entry['body'], mimetype='application/json')
+            response.set_etag(entry['etag'])
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
@@ -0,0 +1,121 @@
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class _Gzip:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class _Brotli:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def process(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+class Compress:
+    """Compresses the responses whose mimetype is in COMPRESS_MIMETYPES with
+    the first encoding of COMPRESS_ENCODINGS the client accepts, brotli
+    being skipped when its package is not installed.
+
+    Bodies under COMPRESS_MIN_SIZE bytes are sent as they are. Streamed
+    responses are compressed chunk by chunk, each chunk being flushed so that
+    the client still receives them as they are produced. The compressed body
+    of a response with a strong ETag, as those of the response cache, is kept
+    in the response cache under that ETag and encoding, and its ETag is made
+    weak, so that If-None-Match keeps matching both representations."""
+    def __init__(self, app=None, cache=None):
+        self.cache = None
+        if app is not None:
+            self.init_app(app, cache)
+
+    def init_app(self, app, cache=None):
+        self.cache = cache
+        # after_request functions run in reverse order: registered before the
+        # others, this one runs last, on the final body and headers
+        app.after_request(self._after_request)
+        app.extensions['compress'] = self
+
+    def _compressor(self, encoding):
+        if encoding == 'br':
+            return _Brotli(current_app.config['COMPRESS_BROTLI_QUALITY'])
+        return _Gzip(current_app.config['COMPRESS_GZIP_LEVEL'])
+
+    def _encoding(self):
+        for encoding in current_app.config['COMPRESS_ENCODINGS']:
+            if encoding == 'br' and brotli is None:
+                continue
+            if request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def compress(self, data, encoding):
+        compressor = self._compressor(encoding)
+        return compressor.process(data) + compressor.finish()
+
+    def _stream(self, chunks, encoding):
+        compressor = self._compressor(encoding)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+    def _after_request(self, response):
+        if (not current_app.config['COMPRESS_ENABLED'] or response.direct_passthrough
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in current_app.config['COMPRESS_MIMETYPES']):
+            return response
+
+        if response.is_streamed:
+            response.vary.add('Accept-Encoding')
+            encoding = self._encoding()
+            if encoding is not None:
+                original = response.response
+                response.response = self._stream(response.iter_encoded(), encoding)
+                if hasattr(original, 'close'):
+                    response.call_on_close(original.close)
+                response.headers['Content-Encoding'] = encoding
+                response.headers.pop('Content-Length', None)
+            return response
+
+        if response.content_length is not None and response.content_length < current_app.config['COMPRESS_MIN_SIZE']:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self._encoding()
+        if encoding is None or request.method == 'HEAD':
+            return response
+
+        etag, weak = response.get_etag()
+        key = etag if etag and not weak and self.cache is not None else None
+        body = key and self.cache.get_variant(key, encoding)
+        if body is None:
+            body = self.compress(response.get_data(), encoding)
+            if key:
+                self.cache.set_variant(key, encoding, body)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        if etag:
+            response.set_etag(etag, weak=True)
+        return response
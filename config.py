@@ -1,4 +1,5 @@
 import os
+from sqlalchemy.pool import QueuePool
 filedir = os.path.dirname(__file__)
 
 class BaseConfig:
@@ -6,10 +7,92 @@ class BaseConfig:
     SECRET_KEY = 'This_is_supposed_to_be_a_secret_key'
     GLOBAL_LOG_FILE = os.path.join(filedir, 'log', 'flask.log')
 
+    #Logging Parameters
+    LOG_LEVEL = 'DEBUG'
+    LOG_MAX_BYTES = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT = 5
+    LOG_ROTATE_INTERVAL = 24 * 3600
+    LOG_FLUSH_EVERY = 100
+    LOG_REQUEST_SAMPLE_RATE = 1.0
+
+    #Optional components. MIGRATIONS_ENABLED = None only sets up migrations
+    #when the app is created by the flask command
+    ADMIN_ENABLED = True
+    SWAGGER_ENABLED = True
+    MIGRATIONS_ENABLED = None
+
     #Database Parametetrs
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(filedir, 'api.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(filedir, 'api.db'))
     SQLALCHEMY_COMMIT_ON_TEARDOWN = True
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': QueuePool,
+        'pool_size': 5,
+        'max_overflow': 10,
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+        'connect_args': {'check_same_thread': False, 'timeout': 5}
+    }
+    #Applied on every new connection. WAL lets readers run alongside the writer
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -16000
+    }
+    DB_RETRY_ATTEMPTS = 5
+    DB_RETRY_BACKOFF = 0.05
+    #Query instrumentation: statements slower than the threshold (seconds) are
+    #logged, and views issuing more queries than their budget are reported
+    SLOW_QUERY_THRESHOLD = 0.1
+    DB_QUERY_HEADERS = False
+    DB_QUERY_BUDGETS = {
+        'views.list_apis': 10,
+        'views.detail_api': 10,
+        'views.search_by_tags': 12,
+        'views.list_endpoints': 10,
+        'views.detail_endpoint': 10
+    }
+    DB_QUERY_BUDGET_STRICT = False
+
+    #Response cache Parameters: 'lru', 'filesystem' or 'null'
+    RESPONSE_CACHE_BACKEND = 'lru'
+    RESPONSE_CACHE_MAX_ENTRIES = 1024
+    RESPONSE_CACHE_DIR = os.path.join(filedir, 'cache')
+    #Seconds an entry is served for: bounds how long a worker with its own
+    #'lru' cache serves what another worker changed. None never expires
+    RESPONSE_CACHE_TTL = 60
+    #Keeps the HTML of the {% cache %} template fragments in the response cache
+    FRAGMENT_CACHE_ENABLED = True
+    #Compiled templates, filled at deploy time by flask templates compile
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(filedir, 'template_cache'))
+
+    #Seconds after which the tag suggestions index is rebuilt from the database
+    TAG_INDEX_REFRESH = 300
+
+    #Response compression: bodies of the listed mimetypes and at least
+    #COMPRESS_MIN_SIZE bytes are sent with the first accepted encoding
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_MIMETYPES = [
+        'text/html', 'text/css', 'text/plain', 'text/csv', 'application/json',
+        'application/x-ndjson', 'application/javascript', 'image/svg+xml'
+    ]
+    COMPRESS_ENCODINGS = ['br', 'gzip']
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+
+    #Static files: fingerprinted URLs are cached as immutable, the others
+    #(favicon.ico, URLs of previous deployments) for STATIC_MAX_AGE
+    STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+    STATIC_MAX_AGE = 3600
+
+    #Metrics Parameters: with METRICS_DIR set, every worker process writes its
+    #metrics to that directory and /metrics reports the sum of all of them
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5
+    METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
 
     # Flask-Security config
     SECURITY_POST_LOGOUT_VIEW = '/login'
@@ -23,4 +106,10 @@ class BaseConfig:
 class Globals:
     ACCEPTED_FIELD_TYPES = ['date', 'datetime', 'string', 'integer', 'boolean']
     ACCEPTED_FIELD_REQUIRED = ['yes', 'no']
-    ITEM_PER_PAGE = 20
\ No newline at end of file
+    ACCEPTED_SORT_COLUMNS = ['id', 'label']
+    ACCEPTED_TAG_SORTS = ['text', 'popular']
+    ITEM_PER_PAGE = 20
+    BULK_CHUNK_SIZE = 500
+    EXPORT_BATCH_SIZE = 200
+    TAG_SUGGESTIONS = 10
+    MAX_TAG_SUGGESTIONS = 50
\ No newline at end of file
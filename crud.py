@@ -1,10 +1,75 @@
+import re
+from itertools import permutations
+
+from flask import current_app
+from sqlalchemy import func, or_, and_, case, text, event, literal_column
 from sqlalchemy.exc import IntegrityError
 
 from config import Globals
-from models import db, Tag, ApiItem, Endpoint, Field
+from models import db, Tag, TagUsage, ApiItem, Endpoint, Field, Counter, api_item_tag_table, endpoint_tag_table
+from loaders import loader_options
+from cache import SEARCH_TAG
+from database import retry_on_lock
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_committed(session):
+    # Invalidate again once committed, in case a concurrent request cached
+    # the previous state between the write and the commit
+    tags = session.info.pop('invalidated_tags', None)
+    if tags:
+        current_app.extensions['response_cache'].invalidate(*tags)
+
+@event.listens_for(db.session, 'after_commit')
+def index_committed_tags(session):
+    # The tag index only suggests the tags once they exist for every request
+    index = current_app.extensions['tag_index']
+    added = session.info.pop('added_tag_texts', None)
+    if added:
+        index.add(added)
+    removed = session.info.pop('removed_tag_texts', None)
+    if removed:
+        index.remove(removed)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def forget_uncommitted(session, previous_transaction):
+    for key in ['invalidated_tags', 'added_tag_texts', 'removed_tag_texts']:
+        session.info.pop(key, None)
 
 class CRUD:
     @staticmethod
+    def _invalidate(*tags):
+        """Drops the cached responses depending on the given tags."""
+        current_app.extensions['response_cache'].invalidate(*tags)
+        db.session.info.setdefault('invalidated_tags', set()).update(tags)
+
+    @staticmethod
+    def getCount(name):
+        """Returns the row count of a catalog table from its counter, falling
+        back on a COUNT query when the counter does not exist."""
+        count = db.session.query(Counter.value).filter_by(name=name).scalar()
+        if count is None:
+            count = db.session.query(func.count()).select_from(db.metadata.tables[name]).scalar()
+        return count
+
+    @staticmethod
+    @retry_on_lock
+    def reconcileCounters(commit=False):
+        """Recomputes every counter from its table, in case they drifted.
+        Returns the names of the counters that were corrected."""
+        corrected = []
+        for name, value in db.session.query(Counter.name, Counter.value).all():
+            table = db.metadata.tables[name]
+            count = db.session.query(func.count()).select_from(table).scalar()
+            if count != value:
+                corrected.append(name)
+                db.session.query(Counter).filter_by(name=name) \
+                    .update({'value': count}, synchronize_session=False)
+        if commit:
+            db.session.commit()
+        return corrected
+
+    @staticmethod
+    @retry_on_lock
     def addTag(text, commit=False):
         text = text.lower().strip()
         existing_tag = Tag.query.filter_by(text=text).first()
@@ -22,24 +87,125 @@ class CRUD:
             return None
 
         db.session.refresh(tag)
+        db.session.info.setdefault('added_tag_texts', []).append(text)
         return tag
 
     @staticmethod
+    def getTagUsage(sort=None, page=None):
+        """Returns (id, text, api_items, endpoints, uses) rows of the tags,
+        sorted by text or, with sort='popular', by decreasing uses. Usage
+        comes from the trigger-maintained tag_usage table."""
+        query = db.session.query(
+            Tag.id, Tag.text, TagUsage.api_items, TagUsage.endpoints, TagUsage.uses
+        ).join(TagUsage, TagUsage.tag_id == Tag.id)
+        if sort == 'popular':
+            query = query.order_by(TagUsage.uses.desc(), Tag.text)
+        else:
+            query = query.order_by(Tag.text)
+        offset = ((page or 1) - 1) * Globals.ITEM_PER_PAGE
+        return query.limit(Globals.ITEM_PER_PAGE).offset(offset).all()
+
+    @staticmethod
+    @retry_on_lock
+    def deleteUnusedTags(commit=False):
+        """Deletes the tags used by no API or endpoint, found through the
+        index of tag_usage.uses. Returns the deleted texts."""
+        unused = db.session.query(TagUsage.tag_id).filter(TagUsage.uses == 0)
+        texts = [t for t, in db.session.query(Tag.text).filter(Tag.id.in_(unused.subquery())).all()]
+        if not texts:
+            return []
+        try:
+            db.session.query(Tag).filter(Tag.id.in_(unused.subquery())).delete(synchronize_session=False)
+            if commit:
+                db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+        db.session.info.setdefault('removed_tag_texts', []).extend(texts)
+        return texts
+
+    @staticmethod
+    @retry_on_lock
+    def reconcileTagUsage(commit=False):
+        """Recomputes the usage of every tag from the association tables, in
+        case it drifted. Returns the number of corrected tags."""
+        counts = {}
+        for table, column in [(api_item_tag_table, 'api_items'), (endpoint_tag_table, 'endpoints')]:
+            for tag_id, count in db.session.query(table.c.tag_id, func.count()).group_by(table.c.tag_id):
+                counts.setdefault(tag_id, {'api_items': 0, 'endpoints': 0})[column] = count
+
+        usage = {u.tag_id: u for u in TagUsage.query.all()}
+        corrected = 0
+        for tag_id, in db.session.query(Tag.id).all():
+            count = counts.get(tag_id, {'api_items': 0, 'endpoints': 0})
+            count['uses'] = count['api_items'] + count['endpoints']
+            row = usage.pop(tag_id, None)
+            if row is None:
+                db.session.add(TagUsage(tag_id=tag_id, **count))
+                corrected += 1
+            elif (row.api_items, row.endpoints, row.uses) != (count['api_items'], count['endpoints'], count['uses']):
+                row.api_items, row.endpoints, row.uses = count['api_items'], count['endpoints'], count['uses']
+                corrected += 1
+        # rows left over from deleted tags
+        for row in usage.values():
+            db.session.delete(row)
+            corrected += 1
+        db.session.flush()
+        if commit:
+            db.session.commit()
+        return corrected
+
+    @staticmethod
+    def _splitTags(tags):
+        """Splits a space separated string of tags into a list of lower cased
+        tags, in input order and without duplicates."""
+        if not tags:
+            return []
+        return list(dict.fromkeys(t.lower() for t in tags.strip().split()))
+
+    @staticmethod
+    @retry_on_lock
     def addTags(tags, commit=False):
-        metatags = []
-        tags_list = tags.strip().split()
-        for tag_text in tags_list:
-            metatags.append(CRUD.addTag(tag_text, commit=commit))
+        """Resolves a space separated string of tags into Tag objects, in input
+        order and without duplicates. Existing tags are fetched with a single
+        IN query and the missing ones are created with a single multi-row
+        INSERT OR IGNORE, so that concurrent creations do not fail."""
+        tags_list = CRUD._splitTags(tags)
+        if not tags_list:
+            return []
+
+        existing = {t.text: t for t in Tag.query.filter(Tag.text.in_(tags_list)).all()}
+        missing = [t for t in tags_list if t not in existing]
+        if missing:
+            try:
+                db.session.execute(
+                    Tag.__table__.insert().prefix_with('OR IGNORE')
+                    .values([{'text': t} for t in missing])
+                )
+                if commit:
+                    db.session.commit()
+            except IntegrityError:
+                # The tags are selected again below, in case a concurrent
+                # write created them, the error being raised if some still miss
+                db.session.rollback()
+                if Tag.query.filter(Tag.text.in_(missing)).count() < len(missing):
+                    raise
+            created = Tag.query.filter(Tag.text.in_(missing)).all()
+            existing.update({t.text: t for t in created})
+            db.session.info.setdefault('added_tag_texts', []).extend(missing)
 
+        metatags = [existing[t] for t in tags_list]
         return metatags
 
     @staticmethod
+    @retry_on_lock
     def addApi(label, url, description='', tags=None, commit=False):
         metatags = CRUD.addTags(tags, commit) if tags else []
         api = ApiItem(label=label, url=url, description=description, tags=metatags)
         db.session.add(api)
         try:
             db.session.flush()
+            CRUD._invalidate(SEARCH_TAG)
             if commit:
                 db.session.commit()
         except IntegrityError:
@@ -50,36 +216,181 @@ class CRUD:
         return api.id
 
     @staticmethod
-    def getApi(id):
-        api = ApiItem.query.filter_by(id=id).first()
+    def _rankByTags(query, model, item_column, tags):
+        """Filters and orders a query on APIs or endpoints by relevance in a
+        single statement: items whose label matches the search, its words
+        being in any order for up to 4 of them, come first, then items sharing
+        the most tags with it."""
+        tags = CRUD._splitTags(tags)
+        phrases = permutations(tags) if len(tags) <= 4 else [tags]
+        labels = [' '.join(p) for p in phrases] + tags
+        matches = db.session.query(
+            item_column.label('item_id'),
+            func.count().label('matches')
+        ).join(Tag, Tag.id == item_column.table.c.tag_id) \
+            .filter(Tag.text.in_(tags)) \
+            .group_by(item_column).subquery()
+
+        label_match = func.lower(model.label).in_(labels)
+        return query.outerjoin(matches, matches.c.item_id == model.id) \
+            .filter(or_(matches.c.matches.isnot(None), label_match)) \
+            .order_by(
+                case([(label_match, 1)], else_=0).desc(),
+                func.coalesce(matches.c.matches, 0).desc(),
+                model.id
+            )
+
+    @staticmethod
+    def _rankedIds(model, item_column, tags):
+        """Returns the ids of the items matching tags, ranked by _rankByTags.
+        Ranked ids are cached by normalized tag set, lower cased, deduplicated
+        and, up to 4 tags, sorted, until a write bumps the search generation.
+        Beyond 4 tags the label must match them in their order, which is kept
+        in the key."""
+        tags = CRUD._splitTags(tags)
+        key = '%s:%s' % (model.__tablename__, ' '.join(sorted(tags) if len(tags) <= 4 else tags))
+        cache = current_app.extensions['response_cache']
+        ids = cache.get_search(key)
+        if ids is None:
+            generation = cache.generation()
+            query = CRUD._rankByTags(db.session.query(model.id), model, item_column, ' '.join(tags))
+            ids = [id for id, in query.all()]
+            cache.set_search(key, ids, generation)
+        return ids
+
+    @staticmethod
+    def _hydrate(query, model, ids):
+        """Loads the items of a list of ids, in the order of the list."""
+        items = {item.id: item for item in query.filter(model.id.in_(ids)).all()} if ids else {}
+        return [items[id] for id in ids if id in items]
+
+    @staticmethod
+    def _keysetPage(query, model, sort=None, after=None):
+        """Returns the page of items following the sort key "after", ordered by
+        the sort column then by id, along with the sort key of the last item
+        when more items follow. Unlike OFFSET, the cost does not depend on how
+        deep the page is and concurrent writes do not shift the pages. Raises
+        ValueError when "after" does not match the sort column."""
+        if after is not None:
+            types = (getattr(model, sort).type.python_type, int) if sort else (int,)
+            if len(after) != len(types) or not all(
+                isinstance(k, t) and not isinstance(k, bool) for k, t in zip(after, types)
+            ):
+                raise ValueError('The cursor does not match the %s sort' % (sort or 'id'))
+        if sort:
+            column = getattr(model, sort)
+            if column.nullable:
+                # matches the expression of the label index of nullable labels
+                column = func.coalesce(column, literal_column("''"))
+            query = query.order_by(column, model.id)
+            if after:
+                query = query.filter(or_(
+                    column > after[0],
+                    and_(column == after[0], model.id > after[1])
+                ))
+        else:
+            query = query.order_by(model.id)
+            if after:
+                query = query.filter(model.id > after[0])
+
+        items = query.limit(Globals.ITEM_PER_PAGE + 1).all()
+        if len(items) <= Globals.ITEM_PER_PAGE:
+            return items, None
+
+        items = items[:Globals.ITEM_PER_PAGE]
+        last = items[-1]
+        next_key = (getattr(last, sort) or '', last.id) if sort else (last.id,)
+        return items, next_key
+
+    @staticmethod
+    @retry_on_lock
+    def addApisBulk(apis, commit=False):
+        """Inserts validated API documents with their nested endpoints, fields
+        and tags using one executemany statement per table. Each document is a
+        dict with the addApi arguments and an "endpoints" list of dicts with the
+        addEndpoint arguments and a "fields" list of dicts with the
+        addEndpointField arguments. Returns the new API ids."""
+        if not apis:
+            return []
+        tags_texts = []
+        for api in apis:
+            tags_texts.append(api.get('tags') or '')
+            for endpoint in api.get('endpoints', []):
+                tags_texts.append(endpoint.get('tags') or '')
+        tag_ids = {t.text: t.id for t in CRUD.addTags(' '.join(tags_texts))}
+
+        def api_row(api):
+            return {'label': api['label'], 'url': api['url'], 'description': api.get('description', '')}
+
+        api_rows, api_tag_rows, endpoint_rows, endpoint_tag_rows, field_rows = [], [], [], [], []
+        try:
+            # Inserting the first API takes SQLite's write lock until the end of the
+            # transaction. Nobody else can insert meanwhile, so the ids following the
+            # current maxima can be assigned to the remaining rows up front.
+            first_id = db.session.execute(
+                ApiItem.__table__.insert().values(api_row(apis[0]))
+            ).inserted_primary_key[0]
+            api_ids = list(range(first_id, first_id + len(apis)))
+            endpoint_id = (db.session.query(func.max(Endpoint.id)).scalar() or 0) + 1
+            field_id = (db.session.query(func.max(Field.id)).scalar() or 0) + 1
+
+            for api_id, api in zip(api_ids, apis):
+                if api_id != first_id:
+                    api_rows.append(dict(api_row(api), id=api_id))
+                api_tag_rows.extend(
+                    {'api_item_id': api_id, 'tag_id': tag_ids[t]} for t in CRUD._splitTags(api.get('tags'))
+                )
+                for endpoint in api.get('endpoints', []):
+                    endpoint_rows.append({
+                        'id': endpoint_id, 'api_item_id': api_id, 'label': endpoint['label'],
+                        'url': endpoint['url'], 'description': endpoint.get('description', '')
+                    })
+                    endpoint_tag_rows.extend(
+                        {'endpoint_id': endpoint_id, 'tag_id': tag_ids[t]} for t in CRUD._splitTags(endpoint.get('tags'))
+                    )
+                    for field in endpoint.get('fields', []):
+                        field_rows.append({
+                            'id': field_id, 'endpoint_id': endpoint_id, 'label': field['label'],
+                            'type': field['type_field'], 'description': field.get('description', ''),
+                            'default': field.get('default', ''), 'required': field.get('required', False)
+                        })
+                        field_id += 1
+                    endpoint_id += 1
+
+            for table, rows in [
+                (ApiItem.__table__, api_rows), (api_item_tag_table, api_tag_rows),
+                (Endpoint.__table__, endpoint_rows), (endpoint_tag_table, endpoint_tag_rows),
+                (Field.__table__, field_rows)
+            ]:
+                if rows:
+                    db.session.execute(table.insert(), rows)
+            CRUD._invalidate(SEARCH_TAG)
+            if commit:
+                db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return None
+
+        return api_ids
+
+    @staticmethod
+    def getApi(id, schema=None):
+        query = ApiItem.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        api = query.filter_by(id=id).first()
         return api
 
     @staticmethod
-    def getApis(tags=None, page=None):
-        apis = []
+    def getApis(tags=None, page=None, schema=None):
         query = ApiItem.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
         if tags:
-            tags = tags.strip().split()
-            tags = [t.lower() for t in tags]
-            apis.extend(query.filter(ApiItem.label.ilike(' '.join(tags))).all())
-            for tag_text in tags:
-                # search by tags and labels
-                apis.extend(query.filter(ApiItem.tags.any(Tag.text == tag_text)).all())
-                apis.extend(query.filter(ApiItem.label.ilike(tag_text)).all())
-
-            deduplicated = list(set(apis))
-            apis_relevance = []
-            for api in deduplicated:
-                api_tags = [t.text for t in api.tags]
-                if api.label.lower() in ' '.join(tags):
-                    relevance = float('inf')
-                else:
-                    relevance = len([t for t in api_tags if t in tags])
-                apis_relevance.append({'api': api, 'relevance': relevance})
-
-            apis_relevance = sorted(apis_relevance, key=lambda x: -x['relevance'])
-            sorted_apis = [a['api'] for a in apis_relevance]
-            return sorted_apis[:Globals.ITEM_PER_PAGE]
+            ids = CRUD._rankedIds(ApiItem, api_item_tag_table.c.api_item_id, tags)
+            offset = ((page or 1) - 1) * Globals.ITEM_PER_PAGE
+            apis = CRUD._hydrate(query, ApiItem, ids[offset:offset + Globals.ITEM_PER_PAGE])
+            return apis
 
         if page:
             apis = query.paginate(page, Globals.ITEM_PER_PAGE).items
@@ -89,13 +400,35 @@ class CRUD:
         return apis
 
     @staticmethod
+    def getApisAfter(after=None, sort=None, schema=None):
+        query = ApiItem.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        return CRUD._keysetPage(query, ApiItem, sort=sort, after=after)
+
+    @staticmethod
+    def streamApis(schema=None):
+        """Iterates over every API, fetching them by batches from a server side
+        cursor so that memory use does not depend on the catalog size."""
+        query = ApiItem.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        return query.order_by(ApiItem.id).yield_per(Globals.EXPORT_BATCH_SIZE)
+
+    @staticmethod
+    @retry_on_lock
     def deleteApi(id, commit=False):
         api = CRUD.getApi(id)
         if api:
             try:
                 code = api.id
+                tags = ['api:%d' % api.id, SEARCH_TAG]
+                for endpoint in api.endpoints:
+                    tags.append('endpoint:%d' % endpoint.id)
+                    tags.extend('field:%d' % f.id for f in endpoint.fields)
                 db.session.delete(api)
                 db.session.flush()
+                CRUD._invalidate(*tags)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -106,6 +439,7 @@ class CRUD:
         return code
 
     @staticmethod
+    @retry_on_lock
     def editApi(id, label=None, url=None, description=None, tags=None, commit=False):
         api = CRUD.getApi(id)
         if api:
@@ -118,6 +452,9 @@ class CRUD:
 
                 db.session.add(api)
                 db.session.flush()
+                CRUD._invalidate('api:%d' % api.id)
+                if label is not None or tags is not None:
+                    CRUD._invalidate(SEARCH_TAG)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -128,12 +465,14 @@ class CRUD:
         return code
 
     @staticmethod
+    @retry_on_lock
     def addEndpoint(api_id, label, url, description='', tags=None, commit=False):
         metatags = CRUD.addTags(tags, commit) if tags else []
         endpoint = Endpoint(api_item_id=api_id, label=label, url=url, description=description, tags=metatags)
         db.session.add(endpoint)
         try:
             db.session.flush()
+            CRUD._invalidate('api:%d:endpoints' % api_id, SEARCH_TAG)
             if commit:
                 db.session.commit()
         except IntegrityError:
@@ -144,36 +483,23 @@ class CRUD:
         return endpoint.id
 
     @staticmethod
-    def getEndpoint(id):
-        endpoint = Endpoint.query.filter_by(id=id).first()
+    def getEndpoint(id, schema=None):
+        query = Endpoint.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        endpoint = query.filter_by(id=id).first()
         return endpoint
 
     @staticmethod
-    def getEndpoints(tags=None, page=None):
-        endpoints = []
+    def getEndpoints(tags=None, page=None, schema=None):
         query = Endpoint.query
+        if schema is not None:
+            query = query.options(*loader_options(schema))
         if tags:
-            tags = tags.strip().split()
-            tags = [t.lower() for t in tags]
-            endpoints.extend(query.filter(Endpoint.label.ilike(' '.join(tags))).all())
-            for tag_text in tags:
-                # search by tags and label
-                endpoints.extend(query.filter(Endpoint.tags.any(Tag.text == tag_text)).all())
-                endpoints.extend(query.filter(Endpoint.label.ilike(tag_text)).all())
-
-                deduplicated = list(set(endpoints))
-                endpoints_relevance = []
-                for endpoint in deduplicated:
-                    endpoint_tags = [t.text for t in endpoint.tags]
-                    if endpoint.label.lower() in ' '.join(tags):
-                        relevance = float('inf')
-                    else:
-                        relevance = len([t for t in endpoint_tags if t in tags])
-                    endpoints_relevance.append({'endpoint': endpoint, 'relevance': relevance})
-
-                endpoints_relevance = sorted(endpoints_relevance, key=lambda x: -x['relevance'])
-                sorted_endpoints = [a['endpoint'] for a in endpoints_relevance]
-                return sorted_endpoints
+            ids = CRUD._rankedIds(Endpoint, endpoint_tag_table.c.endpoint_id, tags)
+            offset = ((page or 1) - 1) * Globals.ITEM_PER_PAGE
+            endpoints = CRUD._hydrate(query, Endpoint, ids[offset:offset + Globals.ITEM_PER_PAGE])
+            return endpoints
 
         if page:
             endpoints = query.paginate(page, Globals.ITEM_PER_PAGE).items
@@ -183,13 +509,41 @@ class CRUD:
         return endpoints
 
     @staticmethod
+    def getEndpointsAfter(after=None, sort=None, api_id=None, schema=None):
+        query = Endpoint.query
+        if api_id:
+            query = query.filter(Endpoint.api_item_id == api_id)
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        return CRUD._keysetPage(query, Endpoint, sort=sort, after=after)
+
+    @staticmethod
+    def getApiEndpoints(api_id, page=None, schema=None):
+        query = Endpoint.query.filter_by(api_item_id=api_id)
+        if schema is not None:
+            query = query.options(*loader_options(schema))
+        offset = ((page or 1) - 1) * Globals.ITEM_PER_PAGE
+        endpoints = query.order_by(Endpoint.id).limit(Globals.ITEM_PER_PAGE).offset(offset).all()
+        return endpoints
+
+    @staticmethod
+    def countApiEndpoints(api_id):
+        count = db.session.query(func.count(Endpoint.id)) \
+            .filter(Endpoint.api_item_id == api_id).scalar()
+        return count
+
+    @staticmethod
+    @retry_on_lock
     def deleteEndpoint(id, commit=False):
         endpoint = CRUD.getEndpoint(id)
         if endpoint:
             try:
                 code = endpoint.id
+                tags = ['endpoint:%d' % endpoint.id, 'api:%d:endpoints' % endpoint.api_item_id, SEARCH_TAG]
+                tags.extend('field:%d' % f.id for f in endpoint.fields)
                 db.session.delete(endpoint)
                 db.session.flush()
+                CRUD._invalidate(*tags)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -200,6 +554,7 @@ class CRUD:
         return code
 
     @staticmethod
+    @retry_on_lock
     def editEndpoint(id, label=None, url=None, description=None, tags=None, commit=False):
         endpoint = CRUD.getEndpoint(id)
         if endpoint:
@@ -212,6 +567,9 @@ class CRUD:
 
                 db.session.add(endpoint)
                 db.session.flush()
+                CRUD._invalidate('endpoint:%d' % endpoint.id)
+                if label is not None or tags is not None:
+                    CRUD._invalidate(SEARCH_TAG)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -232,6 +590,7 @@ class CRUD:
         return field
 
     @staticmethod
+    @retry_on_lock
     def addEndpointField(endpoint_id, label, type_field, description='', default='', required=False, commit=False):
         field = Field(
             endpoint_id=endpoint_id, label=label, type=type_field,
@@ -240,6 +599,7 @@ class CRUD:
         try:
             db.session.add(field)
             db.session.flush()
+            CRUD._invalidate('endpoint:%d' % endpoint_id)
             if commit:
                 db.session.commit()
         except IntegrityError:
@@ -250,6 +610,7 @@ class CRUD:
         return field.id
 
     @staticmethod
+    @retry_on_lock
     def editField(field_id, label=None, type_field=None, description=None, default=None, required=None, commit=False):
         field = CRUD.getField(field_id)
         if field:
@@ -265,6 +626,7 @@ class CRUD:
 
                 db.session.add(field)
                 db.session.flush()
+                CRUD._invalidate('field:%d' % field.id, 'endpoint:%d' % field.endpoint_id)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -275,13 +637,16 @@ class CRUD:
         return code
 
     @staticmethod
+    @retry_on_lock
     def deleteField(id, commit=False):
         field = CRUD.getField(id)
         if field:
             try:
                 code = field.id
+                tags = ['field:%d' % field.id, 'endpoint:%d' % field.endpoint_id]
                 db.session.delete(field)
                 db.session.flush()
+                CRUD._invalidate(*tags)
                 if commit:
                     db.session.commit()
             except IntegrityError:
@@ -290,3 +655,29 @@ class CRUD:
         else:
             code = 0
         return code
+
+    @staticmethod
+    def searchCatalog(terms, kind=None, page=None):
+        """Full text search over APIs, endpoints and fields labels, descriptions
+        and urls through the search_index FTS5 table. Every search term is
+        matched as a prefix and results are ranked by bm25, labels first."""
+        tokens = re.findall(r'\w+', terms.lower()) if terms else []
+        if not tokens:
+            return []
+
+        match = ' '.join('"%s"*' % t for t in tokens)
+        where = 'search_index MATCH :match'
+        if kind:
+            where += ' AND kind = :kind'
+        statement = text(
+            'SELECT kind, item_id, label, description, url, '
+            'bm25(search_index, 0, 0, 10.0, 2.0, 1.0) AS rank '
+            'FROM search_index WHERE %s ORDER BY rank LIMIT :limit OFFSET :offset' % where
+        )
+        rows = db.session.execute(statement, {
+            'match': match,
+            'kind': kind,
+            'limit': Globals.ITEM_PER_PAGE,
+            'offset': ((page or 1) - 1) * Globals.ITEM_PER_PAGE
+        }).fetchall()
+        return [dict(row) for row in rows]
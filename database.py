@@ -0,0 +1,132 @@
+import inspect, random, sys, time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+LOCK_ERRORS = ('database is locked', 'database table is locked', 'database is busy')
+
+def set_sqlite_pragmas(pragmas):
+    """Returns a connect listener running PRAGMA name=value for each item of
+    pragmas on every new DBAPI connection."""
+    def listener(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute('PRAGMA %s=%s' % (name, value))
+        cursor.close()
+    return listener
+
+def init_engine(app):
+    """Applies config['SQLITE_PRAGMAS'] to the connections of the app engine.
+    Pool sizing and recycling come from SQLALCHEMY_ENGINE_OPTIONS, so that a
+    pooled connection keeps its pragmas and page cache between requests."""
+    engine = db.get_engine(app)
+    pragmas = app.config.get('SQLITE_PRAGMAS')
+    if engine.dialect.name == 'sqlite' and pragmas:
+        event.listen(engine, 'connect', set_sqlite_pragmas(pragmas))
+    return engine
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+def _crud_caller():
+    """Returns the name of the innermost CRUD method on the call stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_globals.get('__name__') == 'crud':
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_start'] = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info.pop('query_start')
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+        g.db_time = g.get('db_time', 0) + duration
+    if not has_app_context():
+        return
+    threshold = current_app.config.get('SLOW_QUERY_THRESHOLD')
+    if threshold is not None and duration >= threshold:
+        caller = _crud_caller()
+        current_app.logger.warning('Slow query in %s (%.1f ms)' % (caller, duration * 1000), extra={
+            'duration_ms': round(duration * 1000, 3), 'crud_method': caller,
+            'statement': statement, 'parameters': repr(parameters)
+        })
+
+def reset_query_stats():
+    # g outlives the request when an app context was already pushed
+    g.db_queries = 0
+    g.db_time = 0
+
+def add_query_stats(response):
+    """Checks the query count of the request against the budget of its view
+    in config['DB_QUERY_BUDGETS'] and, in debug mode, reports the count and
+    the time spent in the database in the X-DB-Queries and Server-Timing
+    headers."""
+    config = current_app.config
+    queries = g.get('db_queries', 0)
+    budget = config.get('DB_QUERY_BUDGETS', {}).get(request.endpoint)
+    if budget is not None and queries > budget:
+        message = '%s issued %d queries for a budget of %d' % (request.endpoint, queries, budget)
+        if config.get('DB_QUERY_BUDGET_STRICT'):
+            raise QueryBudgetExceeded(message)
+        current_app.logger.warning(message)
+    if config.get('DEBUG') or config.get('DB_QUERY_HEADERS'):
+        response.headers['X-DB-Queries'] = str(queries)
+        response.headers.add('Server-Timing', 'db;dur=%.3f;desc="%d queries"' % (g.get('db_time', 0) * 1000, queries))
+    return response
+
+def init_query_stats(app):
+    """Counts the queries and the time spent in the database per request."""
+    engine = db.get_engine(app)
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(reset_query_stats)
+    app.after_request(add_query_stats)
+
+def is_lock_error(error):
+    return isinstance(error, OperationalError) and any(
+        message in str(error.orig).lower() for message in LOCK_ERRORS
+    )
+
+def retry_on_lock(f):
+    """Retries a CRUD write method with exponential backoff when SQLite
+    reports a transient lock error, up to config['DB_RETRY_ATTEMPTS'] times.
+
+    The transaction is rolled back before each retry, so only the calls
+    committing their own work are retried: calls made with commit=False,
+    nested in another retried call, or started with pending changes in the
+    session let the error propagate."""
+    signature = inspect.signature(f)
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        session = db.session()
+        commit = signature.bind(*args, **kwargs).arguments.get('commit', False)
+        if not commit or session.info.get('retrying') or session.new or session.dirty or session.deleted:
+            return f(*args, **kwargs)
+
+        attempts = current_app.config.get('DB_RETRY_ATTEMPTS', 1)
+        backoff = current_app.config.get('DB_RETRY_BACKOFF', 0.05)
+        session.info['retrying'] = True
+        try:
+            for attempt in range(attempts):
+                try:
+                    return f(*args, **kwargs)
+                except OperationalError as e:
+                    session.rollback()
+                    if not is_lock_error(e) or attempt == attempts - 1:
+                        raise
+                    current_app.logger.warning(
+                        '%s: database locked, retrying (%d/%d)', f.__name__, attempt + 1, attempts - 1
+                    )
+                    time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        finally:
+            session.info.pop('retrying', None)
+    return wrapper
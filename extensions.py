@@ -1,3 +1,3 @@
 from flask_wtf import CSRFProtect
 
-csrf = CSRFProtect()
\ No newline at end of file
+csrf = CSRFProtect()
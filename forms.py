@@ -1,7 +1,5 @@
 from urllib.parse import urlparse
 import re
-import validators
-from validators.utils import ValidationFailure
 
 from flask_wtf import FlaskForm
 from wtforms import StringField, TextAreaField, SelectField
@@ -27,6 +25,8 @@ class ApiInputValidation:
     @staticmethod
     def url_validation(type=None):
         def validate(value):
+            # validators compiles its URL pattern on import, which is slow
+            import validators
             if type=='domain':
                 if validators.domain(value) is True:
                     return value
@@ -55,6 +55,54 @@ class ApiInputValidation:
                     raise ValueError("%s is not a valid url" % value)
         return validate
 
+    @staticmethod
+    def choice_validation(choices):
+        def validate(value):
+            if value not in choices:
+                raise ValueError("%s is not accepted. Must be one of these: %s" % (value, choices))
+            return value
+
+        return validate
+
+    @staticmethod
+    def document_validation(document, rules, prefix=''):
+        """Validates a JSON document against a dict of rules. A rule is either a
+        (validator, required) tuple or a one item list holding the rules of a
+        list of sub documents. Returns the cleaned document and a dict of
+        errors keyed by the dotted path of the invalid values."""
+        if not isinstance(document, dict):
+            return None, {prefix.rstrip('.') or 'document': "%s is not an object" % document}
+
+        clean, errors = {}, {}
+        for key, rule in rules.items():
+            value = document.get(key)
+            if isinstance(rule, list):
+                if value is None:
+                    clean[key] = []
+                elif not isinstance(value, list):
+                    errors[prefix + key] = "%s is not a list" % value
+                else:
+                    clean[key] = []
+                    for i, item in enumerate(value):
+                        sub_clean, sub_errors = ApiInputValidation.document_validation(
+                            item, rule[0], '%s%s.%d.' % (prefix, key, i)
+                        )
+                        clean[key].append(sub_clean)
+                        errors.update(sub_errors)
+                continue
+
+            validate, required = rule
+            if value is None:
+                if required:
+                    errors[prefix + key] = "Missing required parameter"
+                continue
+            try:
+                clean[key] = validate(value)
+            except ValueError as e:
+                errors[prefix + key] = str(e)
+
+        return clean, errors
+
 class AddApiForm(FlaskForm):
     label = StringField('Label', validators=[DataRequired(), Length(max=80)])
     url = StringField('Url', validators=[DataRequired(), URL()])
@@ -0,0 +1,51 @@
+from flask import current_app, g
+from flask_wtf.csrf import generate_csrf
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+CSRF_PLACEHOLDER = '\x00csrf_token\x00'
+
+class FragmentCacheExtension(Extension):
+    """Adds a cache tag keeping the rendered HTML of a template fragment:
+
+        {% cache 'api_item', api.id depends 'api:' ~ api.id %}...{% endcache %}
+
+    The fragment is stored in the response cache under its name and key
+    values, along with the versions of the tags following "depends", which
+    CRUD writes bump. The CSRF token of the request is kept out of the
+    stored HTML and put back when the fragment is served."""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        keys = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            keys.append(parser.parse_expression())
+        depends = []
+        if parser.stream.skip_if('name:depends'):
+            depends.append(parser.parse_expression())
+            while parser.stream.skip_if('comma'):
+                depends.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(keys), nodes.List(depends)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, keys, depends, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+        cache = current_app.extensions['response_cache']
+        key = ':'.join(str(k) for k in keys)
+        html = cache.get_fragment(key)
+        if html is None:
+            generation = cache.generation()
+            html = caller()
+            token = g.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+            cache.set_fragment(
+                key, html.replace(token, CSRF_PLACEHOLDER) if token else str(html), depends, generation
+            )
+            return html
+        if CSRF_PLACEHOLDER in html:
+            html = html.replace(CSRF_PLACEHOLDER, generate_csrf())
+        return Markup(html)
@@ -0,0 +1,49 @@
+from functools import lru_cache
+
+from marshmallow import fields
+from sqlalchemy import inspect
+from sqlalchemy.orm import selectinload, joinedload
+
+def _nested_schema(field):
+    """Returns the nested schema instance behind a field, unwrapping lists.
+    Returns None for fields that do not nest another schema."""
+    if isinstance(field, fields.List):
+        field = field.inner
+    if isinstance(field, fields.Nested):
+        return field.schema
+    return None
+
+def _walk(schema, model, path, parent_prop):
+    options = []
+    relationships = inspect(model).relationships
+    for field_name, field in schema.fields.items():
+        nested = _nested_schema(field)
+        if nested is None:
+            continue
+        prop = relationships.get(field.attribute or field_name)
+        if prop is None:
+            continue
+        # A backref pointing to the parent we come from (e.g. endpoint.api_item
+        # under api.endpoints) is resolved from the identity map, no query needed
+        if parent_prop is not None and prop in parent_prop._reverse_property:
+            continue
+
+        attr = getattr(model, prop.key)
+        if path is None:
+            loader = selectinload(attr) if prop.uselist else joinedload(attr)
+        else:
+            loader = path.selectinload(attr) if prop.uselist else path.joinedload(attr)
+        options.append(loader)
+        options.extend(_walk(nested, prop.mapper.class_, loader, prop))
+    return options
+
+# Bounded: schema_variant keeps up to 256 variants, each with its nested
+# schemas, and the instances it evicts must not be pinned here
+@lru_cache(maxsize=1024)
+def loader_options(schema):
+    """Derives the eager loading options needed to dump query results with
+    the given marshmallow schema: collections are fetched with selectinload
+    and many-to-one relations with joinedload, so that serializing a page
+    costs a fixed number of queries whatever the number of rows."""
+    model = schema.opts.model
+    return tuple(_walk(schema, model, None, None))
@@ -0,0 +1,111 @@
+import atexit, json, logging, os, queue, time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask.logging import default_handler
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines. Values passed through the "extra"
+    argument of the logging calls are added as top level keys."""
+    RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        data.update({k: v for k, v in vars(record).items() if k not in self.RESERVED})
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler which also rolls over every rotate_interval seconds
+    and only flushes every flush_every records, or when flush() is called by
+    the listener once the queue is drained."""
+    def __init__(self, filename, max_bytes=0, backup_count=0, rotate_interval=None, flush_every=100):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        self.rotate_interval = rotate_interval
+        self.flush_every = flush_every
+        self.pending = 0
+        self.rollover_at = self._next_rollover()
+
+    def _next_rollover(self):
+        if not self.rotate_interval:
+            return None
+        return time.time() + self.rotate_interval
+
+    def shouldRollover(self, record):
+        if self.rollover_at and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.pending = 0
+        self.rollover_at = self._next_rollover()
+
+    def emit(self, record):
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(self.format(record) + self.terminator)
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        super().flush()
+        self.pending = 0
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener flushing its handlers whenever the queue is drained, so
+    that records are written by batches instead of one by one."""
+    def dequeue(self, block):
+        try:
+            return self.queue.get(block=False)
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block=block)
+
+def init_logging(app):
+    """Sends the app logger records through a queue to a background thread
+    writing JSON lines to config['GLOBAL_LOG_FILE'], so that requests never
+    wait on file I/O. Returns the started listener."""
+    config = app.config
+    os.makedirs(os.path.dirname(config['GLOBAL_LOG_FILE']), exist_ok=True)
+    file_handler = BatchedRotatingFileHandler(
+        config['GLOBAL_LOG_FILE'],
+        max_bytes=config.get('LOG_MAX_BYTES', 0),
+        backup_count=config.get('LOG_BACKUP_COUNT', 0),
+        rotate_interval=config.get('LOG_ROTATE_INTERVAL'),
+        flush_every=config.get('LOG_FLUSH_EVERY', 100)
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    listener = BatchingQueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    # Apps built by the same factory share their logger, whose queue handler
+    # from a previous app is replaced
+    for handler in list(app.logger.handlers):
+        if isinstance(handler, QueueHandler):
+            app.logger.removeHandler(handler)
+            atexit.unregister(handler.listener.stop)
+            handler.listener.stop()
+    handler = QueueHandler(log_queue)
+    handler.listener = listener
+    app.logger.propagate = False
+    app.logger.setLevel(config.get('LOG_LEVEL', logging.DEBUG))
+    # Flask's stderr handler would still write every record on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    return listener
@@ -0,0 +1,259 @@
+import atexit, bisect, glob, json, os, tempfile, threading, time
+from collections import defaultdict
+
+from flask import Response, current_app, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name: (type, help, only reported for live processes)
+FAMILIES = {
+    'flask_http_requests_total': ('counter', 'Requests served.', False),
+    'flask_http_request_duration_seconds': ('histogram', 'Request latency.', False),
+    'flask_http_requests_in_flight': ('gauge', 'Requests being served.', True),
+    'db_pool_size': ('gauge', 'Size of the database connection pool.', True),
+    'db_pool_checked_out': ('gauge', 'Database connections in use.', True),
+    'db_pool_overflow': ('gauge', 'Database connections opened beyond the pool size.', True),
+    'response_cache_hits_total': ('counter', 'Responses served from the response cache.', False),
+    'response_cache_misses_total': ('counter', 'Responses missing from the response cache.', False),
+    'response_cache_hit_ratio': ('gauge', 'Share of cacheable responses served from the cache.', False),
+    'search_cache_hits_total': ('counter', 'Tag searches answered from the search cache.', False),
+    'search_cache_misses_total': ('counter', 'Tag searches ranked by the database.', False),
+    'search_cache_hit_ratio': ('gauge', 'Share of tag searches answered from the search cache.', False),
+}
+
+class _Store:
+    """Metrics recorded by a single thread, so that recording never waits on
+    a lock. Stores are only read, and summed, when metrics are collected or
+    a new thread starts recording."""
+    def __init__(self, n_buckets):
+        self.requests = defaultdict(int)
+        self.latency = defaultdict(lambda: [0] * (n_buckets + 1) + [0.0])
+        self.in_flight = defaultdict(int)
+
+    def merge(self, other):
+        """Adds the metrics of other to this store."""
+        for key, value in list(other.requests.items()):
+            self.requests[key] += value
+        for key, values in list(other.latency.items()):
+            total = self.latency[key]
+            for i, value in enumerate(values):
+                total[i] += value
+        for key, value in list(other.in_flight.items()):
+            self.in_flight[key] += value
+
+class Metrics:
+    """Records request counts, in-flight requests and latency histograms
+    labelled by blueprint, restx namespace and status code, and serves them
+    with database pool and response cache gauges at /metrics in the
+    Prometheus text format.
+
+    With config['METRICS_DIR'] set, every process also writes its metrics to
+    a file of that directory at most every METRICS_FLUSH_INTERVAL seconds, and
+    /metrics sums the files of all the workers. Gauges of processes which are
+    no longer running are left out."""
+    def __init__(self, app=None, **kwargs):
+        self._local = threading.local()
+        self._stores = {}
+        self._lock = threading.Lock()
+        self.namespaces = {}
+        self._endpoint_labels = {}
+        if app is not None:
+            self.init_app(app, **kwargs)
+
+    def init_app(self, app, api=None, db=None, cache=None):
+        self.db = db
+        self.cache = cache
+        self.buckets = tuple(app.config.get('METRICS_BUCKETS', DEFAULT_BUCKETS))
+        # metrics of the threads which have exited
+        self._retired = _Store(len(self.buckets))
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        self.flushed_at = 0
+        if api is not None:
+            self.namespaces = {
+                route.resource: ns.name for ns in api.namespaces for route in ns.resources
+            }
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.flush, app)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+        app.extensions['metrics'] = self
+
+    def _store(self):
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = _Store(len(self.buckets))
+            with self._lock:
+                self._prune()
+                self._stores[threading.current_thread()] = store
+        return store
+
+    def _prune(self):
+        # Folds the stores of the threads which have exited into the retired
+        # store, so that they do not pile up with short lived threads
+        for thread, store in list(self._stores.items()):
+            if not thread.is_alive():
+                self._retired.merge(store)
+                del self._stores[thread]
+
+    def _merged(self):
+        """Returns a store summing the metrics of every thread."""
+        total = _Store(len(self.buckets))
+        with self._lock:
+            self._prune()
+            total.merge(self._retired)
+            for store in self._stores.values():
+                total.merge(store)
+        return total
+
+    def _labels(self, endpoint, blueprint):
+        labels = self._endpoint_labels.get(endpoint)
+        if labels is None:
+            view = current_app.view_functions.get(endpoint)
+            namespace = self.namespaces.get(getattr(view, 'view_class', None), '')
+            labels = self._endpoint_labels[endpoint] = (blueprint or '', namespace)
+        return labels
+
+    def _before_request(self):
+        req = request._get_current_object()
+        if req.endpoint == 'metrics':
+            return
+        labels = self._labels(req.endpoint, req.blueprint)
+        self._store().in_flight[labels] += 1
+        req.environ['metrics.start'] = (time.perf_counter(), labels)
+
+    def _record(self, environ, status):
+        start, labels = environ.pop('metrics.start')
+        duration = time.perf_counter() - start
+        store = self._store()
+        store.in_flight[labels] -= 1
+        key = labels + (str(status),)
+        store.requests[key] += 1
+        histogram = store.latency[key]
+        histogram[bisect.bisect_left(self.buckets, duration)] += 1
+        histogram[-1] += duration
+
+    def _after_request(self, response):
+        environ = request.environ
+        if 'metrics.start' in environ:
+            self._record(environ, response.status_code)
+            if self.directory and time.time() - self.flushed_at >= self.flush_interval:
+                self.flush()
+        return response
+
+    def _teardown_request(self, exc):
+        # after_request handlers are skipped for unhandled exceptions
+        environ = request.environ
+        if 'metrics.start' in environ:
+            self._record(environ, 500)
+
+    def snapshot(self, app=None):
+        """Returns the metrics of this process as a list of
+        [name, labels, value] samples."""
+        app = app or current_app._get_current_object()
+        merged = self._merged()
+        requests, latency, in_flight = merged.requests, merged.latency, merged.in_flight
+
+        samples = []
+        for (blueprint, namespace, status), value in requests.items():
+            labels = {'blueprint': blueprint, 'namespace': namespace, 'status': status}
+            samples.append(['flask_http_requests_total', labels, value])
+            histogram = latency[(blueprint, namespace, status)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), histogram):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append(['flask_http_request_duration_seconds_bucket', dict(labels, le=le), cumulative])
+            samples.append(['flask_http_request_duration_seconds_sum', labels, histogram[-1]])
+            samples.append(['flask_http_request_duration_seconds_count', labels, cumulative])
+        for (blueprint, namespace), value in in_flight.items():
+            samples.append([
+                'flask_http_requests_in_flight', {'blueprint': blueprint, 'namespace': namespace}, value
+            ])
+
+        if self.db is not None:
+            pool = self.db.get_engine(app).pool
+            for name in ['size', 'checkedout', 'overflow']:
+                if hasattr(pool, name):
+                    metric = 'db_pool_checked_out' if name == 'checkedout' else 'db_pool_' + name
+                    samples.append([metric, {}, getattr(pool, name)()])
+        if self.cache is not None:
+            samples.append(['response_cache_hits_total', {}, self.cache.hits])
+            samples.append(['response_cache_misses_total', {}, self.cache.misses])
+            samples.append(['search_cache_hits_total', {}, self.cache.search_hits])
+            samples.append(['search_cache_misses_total', {}, self.cache.search_misses])
+        return samples
+
+    def flush(self, app=None):
+        """Writes the metrics of this process to its file of METRICS_DIR."""
+        self.flushed_at = time.time()
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(app), f)
+        os.replace(tmp, os.path.join(self.directory, 'metrics_%d.json' % os.getpid()))
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def collect(self):
+        """Sums the samples of this process and, in multiprocess mode, of the
+        files left by the other ones. Returns {(name, labels): value}."""
+        snapshots = [self.snapshot()]
+        paths = glob.glob(os.path.join(self.directory, 'metrics_*.json')) if self.directory else []
+        for path in paths:
+            pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+            if pid == os.getpid():
+                continue
+            try:
+                with open(path) as f:
+                    samples = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not self._alive(pid):
+                samples = [s for s in samples if not FAMILIES.get(s[0], ('', '', False))[2]]
+            snapshots.append(samples)
+
+        totals = defaultdict(float)
+        for samples in snapshots:
+            for name, labels, value in samples:
+                totals[(name, tuple(sorted(labels.items())))] += value
+
+        for cache in ['response_cache', 'search_cache']:
+            hits = totals.get((cache + '_hits_total', ()))
+            misses = totals.get((cache + '_misses_total', ()))
+            if hits is not None:
+                totals[(cache + '_hit_ratio', ())] = hits / (hits + misses) if hits + misses else 0.0
+        return totals
+
+    def render(self):
+        families = defaultdict(list)
+        for (name, labels), value in self.collect().items():
+            family = name
+            for suffix in ['_bucket', '_sum', '_count']:
+                if name.endswith(suffix) and name[:-len(suffix)] in FAMILIES:
+                    family = name[:-len(suffix)]
+            label_text = ','.join('%s="%s"' % (k, v.replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+            value = int(value) if float(value).is_integer() else value
+            families[family].append('%s{%s} %s' % (name, label_text, value) if labels else '%s %s' % (name, value))
+
+        lines = []
+        for family, samples in families.items():
+            kind, help_text = FAMILIES[family][:2]
+            lines.append('# HELP %s %s' % (family, help_text))
+            lines.append('# TYPE %s %s' % (family, kind))
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+    def view(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
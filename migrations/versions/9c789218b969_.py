@@ -0,0 +1,65 @@
+"""full text search index
+
+Revision ID: 9c789218b969
+Revises: bce985768a47
+Create Date: 2026-10-18 15:50:12.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c789218b969'
+down_revision = 'bce985768a47'
+branch_labels = None
+depends_on = None
+
+# (kind, table, rowid offset, url expression)
+# The index rowid is id * 3 + offset so that triggers can update and delete
+# entries by rowid instead of scanning the UNINDEXED columns
+INDEXED_TABLES = [
+    ('api', 'api_item', 0, '{row}.url'),
+    ('endpoint', 'endpoint', 1, '{row}.url'),
+    ('field', 'field', 2, "''"),
+]
+
+
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "kind UNINDEXED, item_id UNINDEXED, label, description, url, "
+        "tokenize = 'unicode61', prefix = '2 3')"
+    )
+    for kind, table, offset, url in INDEXED_TABLES:
+        values = "{row}.id * 3 + %d, '%s', {row}.id, {row}.label, {row}.description, %s" % (
+            offset, kind, url
+        )
+        insert = "INSERT INTO search_index(rowid, kind, item_id, label, description, url) VALUES (%s);"
+        delete = "DELETE FROM search_index WHERE rowid = old.id * 3 + %d;" % offset
+        op.execute(
+            "INSERT INTO search_index(rowid, kind, item_id, label, description, url) "
+            "SELECT %s FROM %s" % (values.format(row=table), table)
+        )
+        op.execute(
+            "CREATE TRIGGER search_index_%s_ai AFTER INSERT ON %s BEGIN %s END" % (
+                table, table, insert % values.format(row='new')
+            )
+        )
+        op.execute(
+            "CREATE TRIGGER search_index_%s_au AFTER UPDATE ON %s BEGIN %s %s END" % (
+                table, table, delete, insert % values.format(row='new')
+            )
+        )
+        op.execute(
+            "CREATE TRIGGER search_index_%s_ad AFTER DELETE ON %s BEGIN %s END" % (
+                table, table, delete
+            )
+        )
+
+
+def downgrade():
+    for kind, table, offset, url in INDEXED_TABLES:
+        for suffix in ['ai', 'au', 'ad']:
+            op.execute("DROP TRIGGER IF EXISTS search_index_%s_%s" % (table, suffix))
+    op.execute("DROP TABLE IF EXISTS search_index")
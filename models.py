@@ -58,10 +58,12 @@ class ApiItem(db.Model):
         'Tag', secondary=api_item_tag_table, lazy=True,
         backref=db.backref('api_items', lazy=True)
     )
+    # keyset pagination by label
+    __table_args__ = (db.Index('ix_api_item_label_id', label, id),)
 
 class Endpoint(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    api_item_id = db.Column(db.Integer, db.ForeignKey('api_item.id'), nullable=False)
+    api_item_id = db.Column(db.Integer, db.ForeignKey('api_item.id'), nullable=False, index=True)
     url = db.Column(db.Text, nullable=False)
     label = db.Column(db.String(80), nullable=True)
     description = db.Column(db.String(400), nullable=True)
@@ -73,15 +75,31 @@ class Endpoint(db.Model):
         'Tag', secondary=endpoint_tag_table, lazy=True,
         backref=db.backref('endpoints', lazy=True)
     )
+    # keyset pagination by label, null labels sorting as empty ones
+    __table_args__ = (db.Index('ix_endpoint_label_id', db.func.coalesce(label, db.literal_column("''")), id),)
 
 class Field(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    endpoint_id = db.Column(db.Integer, db.ForeignKey('endpoint.id'), nullable=False)
+    endpoint_id = db.Column(db.Integer, db.ForeignKey('endpoint.id'), nullable=False, index=True)
     label = db.Column(db.String(80), nullable=False)
     type = db.Column(db.String(20), nullable=False)
     description = db.Column(db.String(400), nullable=True)
     default = db.Column(db.String(200), nullable=True)
     required = db.Column(db.Boolean, default=False)
 
+class Counter(db.Model):
+    """Row counts of the catalog tables, kept up to date by triggers
+    (see migrations) so that counting never scans a table."""
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+class TagUsage(db.Model):
+    """Number of APIs and endpoints using each tag, kept up to date by
+    triggers on the association tables (see migrations), like the counters."""
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    api_items = db.Column(db.Integer, nullable=False, default=0)
+    endpoints = db.Column(db.Integer, nullable=False, default=0)
+    uses = db.Column(db.Integer, nullable=False, default=0, index=True)
+
 user_datastore = SQLAlchemyUserDatastore(db, User, Role)
 security = Security()
@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from flask_marshmallow import Marshmallow
 from flask_marshmallow.fields import fields
 
@@ -43,6 +45,8 @@ class ApiSchemaRaw(ma.SQLAlchemyAutoSchema):
 
     tags = fields.List(fields.Pluck(TagSchema, "text"), many=True)
 
+api_raw_schema = ApiSchemaRaw()
+
 class EndpointSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Endpoint
@@ -59,3 +63,42 @@ class ApiSchema(ApiSchemaRaw):
 
 api_schema = ApiSchema()
 apis_schema = ApiSchema(many=True)
+
+def _nested_paths(schema_class, depth, prefix=''):
+    """Yields the dotted paths of the nested objects found deeper than depth.
+    Plucked tags are flat values and do not count as a nesting level."""
+    for name, field in schema_class._declared_fields.items():
+        nested = field.inner if isinstance(field, fields.List) else field
+        if not isinstance(nested, fields.Nested) or isinstance(nested, fields.Pluck):
+            continue
+        if depth <= 0:
+            yield prefix + name
+        else:
+            yield from _nested_paths(nested.nested, depth - 1, prefix + name + '.')
+
+def _check_nested(schema):
+    """Builds the nested schemas of schema, which marshmallow only does on
+    first use, so that their unknown only and exclude fields raise now."""
+    for field in schema.fields.values():
+        nested = field.inner if isinstance(field, fields.List) else field
+        if isinstance(nested, fields.Nested):
+            _check_nested(nested.schema)
+
+@lru_cache(maxsize=256)
+def schema_variant(schema_class, many=False, only=None, exclude=None, depth=None):
+    """Returns a cached instance of schema_class restricted to the "only" and
+    "exclude" dotted field names and to depth levels of nested objects. Ids
+    are always kept since caching relies on them. Raises ValueError for
+    unknown fields."""
+    if only:
+        only = set(only)
+        parts = [path.split('.') for path in only]
+        only |= {'.'.join(p[:i]) + '.id' for p in parts for i in range(1, len(p))}
+        only.add('id')
+    exclude = set(f for f in exclude or [] if f != 'id' and not f.endswith('.id'))
+    if depth is not None:
+        exclude |= set(_nested_paths(schema_class, depth))
+    schema = schema_class(many=many, only=only, exclude=exclude)
+    _check_nested(schema)
+    return schema
+
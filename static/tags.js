@@ -0,0 +1,27 @@
+// Suggests tags in every tags input, completing the word being typed
+$(function () {
+    var timer = null;
+
+    $('input[name="tags"]').each(function (i, input) {
+        var list = $('<datalist>').attr('id', 'tags-suggestions-' + i).insertAfter(input);
+        $(input).attr({list: list.attr('id'), autocomplete: 'off'});
+    });
+
+    $(document).on('input', 'input[name="tags"]', function () {
+        var input = $(this);
+        var words = input.val().split(' ');
+        var prefix = words.pop();
+        clearTimeout(timer);
+        if (!prefix) {
+            return;
+        }
+        timer = setTimeout(function () {
+            $.getJSON('/api/tags/suggest', {prefix: prefix}, function (tags) {
+                var head = words.length ? words.join(' ') + ' ' : '';
+                $('#' + input.attr('list')).empty().append(tags.map(function (tag) {
+                    return $('<option>').attr('value', head + tag.text);
+                }));
+            });
+        }, 100);
+    });
+});
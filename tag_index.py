@@ -0,0 +1,97 @@
+import bisect, heapq, threading, time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+
+from models import db, Tag, TagUsage
+
+class TagIndex:
+    """In-process index of the tag texts, answering prefix queries without
+    hitting the database.
+
+    Texts are kept in a sorted list, so that the tags starting with a prefix
+    are a contiguous slice found by bisection, and ranked by their usage
+    count from tag_usage: the number of APIs and endpoints using them. The
+    index is built when the app starts, tags created or deleted by this
+    process are added or removed once committed, and it is rebuilt every
+    TAG_INDEX_REFRESH seconds to pick up the changes of the other workers
+    and the new usage counts. Rebuilds run in a background thread, requests
+    being answered from the current index meanwhile."""
+    def __init__(self, app=None):
+        self.texts = []
+        self.uses = {}
+        self._short = {}
+        self.built_at = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.engine = db.get_engine(app)
+        self.refresh = app.config.get('TAG_INDEX_REFRESH', 300)
+        self.logger = app.logger
+        self._build()
+        app.extensions['tag_index'] = self
+
+    def _build(self):
+        try:
+            self.build()
+        except DBAPIError as e:
+            # e.g. a database still to be migrated: built again on next use
+            self.logger.warning('Tag index not built: %s', e.orig)
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._build, name='tag-index', daemon=True)
+            self._thread.start()
+
+    def build(self):
+        with self.engine.connect() as connection:
+            tags = dict(connection.execute(
+                select([Tag.text, func.coalesce(TagUsage.uses, 0)]).select_from(Tag.__table__.outerjoin(TagUsage.__table__))
+            ).fetchall())
+        with self._lock:
+            self.uses = tags
+            self.texts = sorted(tags)
+            self._short = {}
+            self.built_at = time.time()
+
+    def add(self, texts):
+        """Adds the new tag texts, unused so far."""
+        with self._lock:
+            for text in texts:
+                if text not in self.uses:
+                    self.uses[text] = 0
+                    bisect.insort(self.texts, text)
+            self._short = {}
+
+    def remove(self, texts):
+        """Removes the deleted tag texts."""
+        with self._lock:
+            for text in texts:
+                if self.uses.pop(text, None) is not None:
+                    del self.texts[bisect.bisect_left(self.texts, text)]
+            self._short = {}
+
+    def suggest(self, prefix, limit=10):
+        """Returns the limit most used tags starting with prefix, as
+        (text, uses) tuples. The suggestions of the prefixes shorter than 3
+        characters, which match the most tags, are kept until the index
+        changes."""
+        if not self.built_at or (self.refresh is not None and time.time() - self.built_at > self.refresh):
+            self._rebuild_in_background()
+        prefix = prefix.lower().strip()
+        short = self._short
+        suggestions = short.get((prefix, limit))
+        if suggestions is None:
+            texts, uses = self.texts, self.uses
+            start = bisect.bisect_left(texts, prefix)
+            end = bisect.bisect_left(texts, prefix + '\uffff', start)
+            matches = heapq.nsmallest(limit, texts[start:end], key=lambda t: -uses.get(t, 0))
+            suggestions = [(t, uses.get(t, 0)) for t in matches]
+            if len(prefix) < 3 and len(short) < 4096:
+                short[(prefix, limit)] = suggestions
+        return suggestions
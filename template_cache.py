@@ -0,0 +1,42 @@
+import os, tempfile
+
+from jinja2 import FileSystemBytecodeCache, TemplateSyntaxError
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache whose files are replaced atomically, so that workers
+    sharing the directory never load a file another one is still writing."""
+    def dump_bytecode(self, bucket):
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp, self._get_cache_filename(bucket))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+def init_template_cache(app):
+    """Keeps the compiled templates in config['TEMPLATE_CACHE_DIR'], so that
+    a new worker loads them instead of compiling them on its first requests.
+    Entries are keyed by template path and invalidated by a checksum of its
+    source, so the directory must be filled from the deployed tree."""
+    directory = app.config.get('TEMPLATE_CACHE_DIR')
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = AtomicBytecodeCache(directory)
+    return app.jinja_env.bytecode_cache
+
+def compile_templates(app):
+    """Compiles every template the app can load, its own and those of its
+    extensions, into the bytecode cache. Returns the compiled template names
+    and a {name: error} dict of the templates which failed to compile."""
+    compiled, errors = [], {}
+    for name in app.jinja_env.list_templates():
+        try:
+            app.jinja_env.get_template(name)
+        except TemplateSyntaxError as e:
+            errors[name] = '%s (line %s)' % (e.message, e.lineno)
+        else:
+            compiled.append(name)
+    return compiled, errors
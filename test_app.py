@@ -1,17 +1,43 @@
 #pytest -W ignore -s
-import pytest, random
+import pytest, random, json, csv, gzip, io, logging, os, queue, sqlite3, base64, threading
+from contextlib import contextmanager
+from unittest import mock
+from logging.handlers import QueueHandler
+from flask import url_for
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-from app import app as flask_app
-from models import Tag
-from crud import CRUD, db
+from app import create_app
+from models import Tag, TagUsage, Counter, ApiItem, Endpoint, Field
+from crud import CRUD, db, index_committed_tags, forget_uncommitted
+from schemas import apis_schema, schema_variant, ApiSchema, EndpointSchema
+from schemas import endpoints_schema, fields_schema, tags_schema
+from serializers import fast_dump
 from utils import generate_random_string
+from logs import JsonFormatter, BatchedRotatingFileHandler, BatchingQueueListener
+from database import QueryBudgetExceeded
+from cache import LRUBackend, FileSystemBackend, SEARCH_TAG
+from api import JsonMethods
 
 print('\n=> Starting testing')
+flask_app = create_app({'DB_QUERY_BUDGET_STRICT': True})
+
 @pytest.fixture(scope="session")
 def app():
     flask_app.app_context().push()
     return flask_app
 
+@contextmanager
+def count_queries():
+    counter = {'count': 0}
+    def increment(*args):
+        counter['count'] += 1
+    event.listen(db.engine, 'before_cursor_execute', increment)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', increment)
+
 #============HTTP testing=================
 @pytest.fixture(scope="session")
 def client(app):
@@ -22,6 +48,157 @@ def test_index_page(client):
     response = client.get('/')
     assert response.status_code == 200
 
+def test_bulk_import(mock_crud, client):
+    print('\n=> Testing bulk importing apis with endpoints and fields')
+    tags = ' '.join(generate_random_string() for _ in range(2))
+    apis = [{
+        'label': generate_random_string(), 'url': 'https://www.example.com/api', 'tags': tags,
+        'endpoints': [{
+            'label': generate_random_string(), 'url': '/resource/%d' % i, 'tags': tags,
+            'fields': [{'label': generate_random_string(), 'field_type': 'string', 'required': 'yes'}]
+        } for i in range(3)]
+    } for _ in range(2)]
+    apis.append({'label': generate_random_string(), 'url': 'not an url'})
+    response = client.post('/api/bulk/', json={'apis': apis})
+    assert response.json['errors'][0]['index'] == 2
+    assert 'url' in response.json['errors'][0]['errors']
+    ids = response.json['ids']
+    assert len(ids) == 2
+    api = CRUD.getApi(ids[1])
+    assert api.label == apis[1]['label']
+    assert set(t.text for t in api.tags) == set(tags.split())
+    assert [len(e.fields) for e in api.endpoints] == [1, 1, 1]
+    assert api.endpoints[0].fields[0].required is True
+
+def encode_json_cursor(raw):
+    return base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+
+def test_apis_cursor_pagination(client, mocker):
+    print('\n=> Testing crawling apis with cursor pagination')
+    mocker.patch('crud.Globals.ITEM_PER_PAGE', 2)
+    for sort in ['id', 'label']:
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            response = client.get('/api/apis/', query_string={'cursor': cursor, 'sort': sort})
+            assert response.status_code == 200
+            ids.extend(a['id'] for a in response.json['items'])
+            cursor = response.json['next_cursor']
+        assert len(ids) == len(set(ids)) == client.get('/api/apis/?count=true').json['count']
+
+    for raw in [{'sort': 'label', 'key': [5]}, {'sort': 'label', 'key': [5, 'a']},
+                {'sort': None, 'key': [[1]]}, {'sort': None, 'key': []}, ['label']]:
+        for path in ['/api/apis/', '/api/endpoints/']:
+            response = client.get(path, query_string={'cursor': encode_json_cursor(raw)})
+            assert response.status_code == 400 and response.json['status'] == 'error'
+    response = client.get('/api/apis/', query_string={'cursor': '', 'tags': 'web'})
+    assert response.status_code == 400
+
+def test_static_assets(client, mocker, tmp_path):
+    print('\n=> Testing fingerprinted and precompressed static files')
+    assets = flask_app.extensions['static_assets']
+    (tmp_path / 'style.css').write_text('body { color: #333; }\n' * 50)
+    mocker.patch.multiple(assets, folder=str(tmp_path), hashed={}, originals={})
+    assets.build_manifest()
+    assert assets.compress() == ['style.css.gz']
+    with flask_app.test_request_context():
+        url = url_for('static', filename='style.css')
+    assert url != '/static/style.css'
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    assert response.mimetype == 'text/css'
+    assert gzip.decompress(response.data) == (tmp_path / 'style.css').read_bytes()
+    response = client.get('/static/style.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Cache-Control'] == 'public, max-age=3600'
+
+#============Logging testing=================
+def test_app_logger_handlers():
+    print('\n=> Testing the app logger only writes through the logging queue')
+    handlers = flask_app.logger.handlers
+    assert len(handlers) == 1 and isinstance(handlers[0], QueueHandler)
+
+def test_queue_logging_json_lines(tmp_path):
+    print('\n=> Testing records are written as JSON lines by the background listener')
+    log_file = str(tmp_path / 'test.log')
+    handler = BatchedRotatingFileHandler(log_file, max_bytes=400, backup_count=10, flush_every=10)
+    handler.setFormatter(JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    listener = BatchingQueueListener(log_queue, handler)
+    logger = logging.getLogger('test_queue_logging')
+    logger.addHandler(QueueHandler(log_queue))
+    listener.start()
+    for i in range(5):
+        logger.warning('line %d', i, extra={'url': '/%d' % i})
+    listener.stop()
+    handler.close()
+    lines = [json.loads(l) for f in sorted(tmp_path.iterdir()) for l in f.read_text().splitlines()]
+    assert sorted(l['url'] for l in lines) == ['/%d' % i for i in range(5)]
+    assert len(list(tmp_path.iterdir())) > 1
+
+#============Metrics testing=================
+def test_metrics_endpoint(client, mocker, tmp_path):
+    print('\n=> Testing the Prometheus metrics and their multiprocess aggregation')
+    client.get('/')
+    client.get('/api/apis/?count=true')
+    text = client.get('/metrics').data.decode()
+    assert '# TYPE flask_http_request_duration_seconds histogram' in text
+    assert 'flask_http_requests_total{blueprint="views",namespace="",status="200"}' in text
+    assert 'le="+Inf",namespace="apis",status="200"}' in text
+    assert 'response_cache_hit_ratio' in text and 'db_pool_checked_out' in text
+
+    metrics = flask_app.extensions['metrics']
+    mocker.patch.object(metrics, 'directory', str(tmp_path))
+    labels = {'blueprint': 'views', 'namespace': '', 'status': '200'}
+    key = ('flask_http_requests_total', tuple(sorted(labels.items())))
+    in_flight_key = ('flask_http_requests_in_flight', (('blueprint', 'views'), ('namespace', '')))
+    local = metrics.collect()
+    # a worker which has exited: its counters are kept, its gauges are not
+    with open(tmp_path / 'metrics_999999999.json', 'w') as f:
+        json.dump([['flask_http_requests_total', labels, 5], [in_flight_key[0], dict(in_flight_key[1]), 2]], f)
+    aggregated = metrics.collect()
+    assert aggregated[key] == local[key] + 5
+    assert aggregated[in_flight_key] == local[in_flight_key]
+
+    # the store of an exited thread is folded into the retired one
+    labels_key = ('views', '', '200')
+    thread = threading.Thread(target=lambda: metrics._store().requests.__setitem__(labels_key, 3))
+    thread.start()
+    thread.join()
+    assert metrics.collect()[key] == aggregated[key] + 3
+    assert thread not in metrics._stores
+
+#============Application factory testing=================
+def test_create_app_components(app):
+    print('\n=> Testing the application factory and its optional components')
+    lean = create_app({'ADMIN_ENABLED': False, 'SWAGGER_ENABLED': False, 'RESPONSE_CACHE_BACKEND': 'null'})
+    assert lean is not app and lean.config['DB_QUERY_BUDGET_STRICT'] is False
+    rules = {rule.endpoint for rule in lean.url_map.iter_rules()}
+    assert 'specs' not in rules and 'admin.index' not in rules and 'migrate' not in lean.extensions
+    assert {'specs', 'admin.index'} <= {rule.endpoint for rule in app.url_map.iter_rules()}
+    # each app keeps its own extensions
+    for name in ['response_cache', 'metrics', 'static_assets', 'compress', 'tag_index', 'api']:
+        assert lean.extensions[name] is not app.extensions[name]
+    assert isinstance(app.extensions['response_cache'].backend, LRUBackend)
+    assert app.extensions['api'].app is app and app.extensions['compress'].cache is app.extensions['response_cache']
+
+#============Templates testing=================
+def test_template_precompilation(mock_crud, tmp_path, mocker):
+    print('\n=> Testing templates precompiled by the CLI are loaded without compiling')
+    # mock_crud: the command tears down its own app context, which commits the session
+    config = {'TEMPLATE_CACHE_DIR': str(tmp_path), 'ADMIN_ENABLED': False, 'SWAGGER_ENABLED': False}
+    result = create_app(config).test_cli_runner().invoke(args=['templates', 'compile'])
+    assert result.exit_code == 0, result.output
+    assert len(list(tmp_path.iterdir())) > 10
+
+    worker = create_app(config)
+    compile_spy = mocker.spy(worker.jinja_env, 'compile')
+    worker.jinja_env.get_template('api_detailing.html')
+    assert compile_spy.call_count == 0
+
 #============CRUD testing=================
 # Mocking db.sessions.commit() to avoid commiting
 # test objects by mistake
@@ -44,6 +221,82 @@ def test_adding_multiple_tags(mock_crud, context_tags):
     print('\n=> Testing adding multiple tags to the database')
     assert len(context_tags.get('tags')) > 1
 
+def test_adding_tags_in_bulk(mock_crud, context_tags):
+    print('\n=> Testing resolving existing and new tags in bulk')
+    existing = context_tags.get('tags').split()
+    new = [generate_random_string(12) for _ in range(3)]
+    tags_list = [new[0], existing[1], new[1], existing[0], new[2], new[0]]
+    with count_queries() as counter:
+        metatags = CRUD.addTags(' '.join(tags_list))
+    assert counter['count'] == 3
+    assert [t.text for t in metatags] == list(dict.fromkeys(tags_list))
+    assert all(t.id for t in metatags)
+
+def test_adding_tags_integrity_error(mock_crud, mocker):
+    print('\n=> Testing tags are selected again or the error raised after an integrity error')
+    mocker.patch('crud.db.session.rollback')
+    execute = db.session.execute
+    def concurrent_insert(statement):
+        execute(statement)
+        raise IntegrityError('INSERT', {}, Exception('concurrent insert'))
+    texts = [generate_random_string(12) for _ in range(2)]
+    mocker.patch('crud.db.session.execute', side_effect=concurrent_insert)
+    assert [t.text for t in CRUD.addTags(' '.join(texts))] == texts
+    mocker.patch('crud.db.session.execute', side_effect=IntegrityError('INSERT', {}, Exception('failed')))
+    with pytest.raises(IntegrityError):
+        CRUD.addTags(generate_random_string(12))
+
+def test_tag_suggestions(mock_crud, client, mocker):
+    print('\n=> Testing tag suggestions from the in-memory prefix index')
+    prefix = generate_random_string(8)
+    CRUD.addTags(' '.join(prefix + s for s in ['b', 'a', 'c']))
+    CRUD.addTag(prefix + 'd')
+    index = flask_app.extensions['tag_index']
+    # tags are only suggested once committed
+    assert prefix + 'a' not in index.uses
+    index_committed_tags(db.session())
+    index.uses[prefix + 'c'] = 2
+    with count_queries() as counter:
+        response = client.get('/api/tags/suggest', query_string={'prefix': prefix.upper(), 'limit': 3})
+    assert counter['count'] == 0
+    assert [t['text'] for t in response.json] == [prefix + s for s in ['c', 'a', 'b']]
+    assert response.json[0]['uses'] == 2
+    assert client.get('/api/tags/suggest?prefix=%s&limit=100' % prefix).status_code == 400
+
+    rolled_back = generate_random_string(12)
+    CRUD.addTags(rolled_back)
+    forget_uncommitted(db.session(), None)
+    index_committed_tags(db.session())
+    assert rolled_back not in index.uses
+
+    # a stale index is rebuilt in the background, requests not waiting for it
+    building, release = threading.Event(), threading.Event()
+    build = mocker.patch.object(index, 'build', side_effect=lambda: building.set() or release.wait(5))
+    mocker.patch.object(index, 'built_at', 0)
+    for _ in range(2):
+        response = client.get('/api/tags/suggest', query_string={'prefix': prefix, 'limit': 3})
+        assert [t['text'] for t in response.json] == [prefix + s for s in ['c', 'a', 'b']]
+    assert building.wait(5)
+    release.set()
+    index._thread.join()
+    assert build.call_count == 1
+
+def test_sqlite_profile_and_lock_retry(mock_crud, mocker):
+    print('\n=> Testing the SQLite pragmas and the retry of locked writes')
+    assert db.session.execute('PRAGMA journal_mode').scalar() == 'wal'
+    assert db.session.execute('PRAGMA synchronous').scalar() == 1
+    sleep = mocker.patch('database.time.sleep')
+    locked = OperationalError('COMMIT', {}, sqlite3.OperationalError('database is locked'))
+    mock_crud.side_effect = [locked, locked, True]
+    tag = CRUD.addTag(generate_random_string(12), commit=True)
+    assert tag.id and mock_crud.call_count == 3 and sleep.call_count == 2
+
+    mock_crud.reset_mock(side_effect=True)
+    mock_crud.side_effect = locked
+    with pytest.raises(OperationalError):
+        CRUD.addTag(generate_random_string(12), commit=True)
+    assert mock_crud.call_count == flask_app.config['DB_RETRY_ATTEMPTS']
+
 @pytest.fixture(scope="function")
 def context_api(mock_crud, context_tags):
     context = context_tags
@@ -88,6 +341,79 @@ def test_filter_apis_by_tags(mock_crud, context_api):
     apis = CRUD.getApis(context_api.get('tags'))
     assert apis
 
+def test_apis_tags_search_ranking(mock_crud, context_api):
+    print('\n=> Testing apis tags search ranks by label then matching tags')
+    tags = context_api.get('tags').split()
+    one_tag_id = CRUD.addApi(generate_random_string(), 'url', tags=tags[0])
+    label_id = CRUD.addApi(tags[1], 'url')
+    apis = CRUD.getApis(' '.join(tags))
+    ids = [a.id for a in apis]
+    assert ids[0] == label_id
+    assert ids.index(context_api.get('api_id')) < ids.index(one_tag_id)
+
+def test_search_result_cache(mock_crud, context_api, client):
+    print('\n=> Testing ranked ids of tag searches are cached until a write')
+    cache = flask_app.extensions['response_cache']
+    first, second = context_api.get('tags').split()
+    ids = [a.id for a in CRUD.getApis('%s %s' % (second.upper(), first))]
+    hits = cache.search_hits
+    with count_queries() as counter:
+        apis = CRUD.getApis('%s %s %s' % (first, second, first))
+    assert cache.search_hits == hits + 1
+    assert [a.id for a in apis] == ids and context_api.get('api_id') in ids
+    assert counter['count'] == 1
+
+    new_id = CRUD.addApi(first, 'url')
+    assert [a.id for a in CRUD.getApis(first)][0] == new_id
+    assert cache.search_hits == hits + 1
+    assert 'search_cache_hit_ratio' in client.get('/metrics').data.decode()
+
+    # the label of a long search matches the words in the typed order
+    words = [generate_random_string() for _ in range(5)]
+    label_id = CRUD.addApi(' '.join(words), 'url')
+    CRUD.getApis(' '.join(reversed(words)))
+    assert [a.id for a in CRUD.getApis(' '.join(words))][0] == label_id
+
+def test_tag_usage_counts(mock_crud, context_api, client):
+    print('\n=> Testing tag usage counts follow the associations and prune unused tags')
+    api_id = context_api.get('api_id')
+    first, second = context_api.get('tags').split()
+    def usage(text):
+        return db.session.query(TagUsage.api_items, TagUsage.endpoints, TagUsage.uses) \
+            .join(Tag, Tag.id == TagUsage.tag_id).filter(Tag.text == text).one()
+    assert usage(first) == (1, 0, 1)
+    CRUD.addEndpoint(api_id, generate_random_string(), '/url', tags=first)
+    CRUD.editApi(api_id, tags=second)
+    assert usage(first) == (0, 1, 1)
+    assert usage(second) == (1, 0, 1)
+
+    uses = [t['uses'] for t in client.get('/api/tags/?sort=popular').json]
+    assert uses == sorted(uses, reverse=True)
+
+    db.session.query(TagUsage).filter(TagUsage.tag_id == context_api.get('metatags')[0].id) \
+        .update({'uses': 7}, synchronize_session=False)
+    assert CRUD.reconcileTagUsage() == 1
+    assert usage(first) == (0, 1, 1)
+
+    unused = CRUD.addTag(generate_random_string()).text
+    index_committed_tags(db.session())
+    assert unused in flask_app.extensions['tag_index'].uses
+    deleted = CRUD.deleteUnusedTags()
+    index_committed_tags(db.session())
+    assert unused in deleted and first not in deleted and second not in deleted
+    assert Tag.query.filter_by(text=unused).first() is None
+    assert unused not in flask_app.extensions['tag_index'].uses
+
+def test_full_text_search(mock_crud, context_api):
+    print('\n=> Testing full text search by label prefix')
+    api_id = context_api.get('api_id')
+    api = CRUD.getApi(api_id)
+    results = CRUD.searchCatalog(api.label[:3], kind='api')
+    assert api_id in [r['item_id'] for r in results]
+    description_word = api.description.split()[-1]
+    results = CRUD.searchCatalog(description_word)
+    assert ('api', api_id) in [(r['kind'], r['item_id']) for r in results]
+
 @pytest.fixture(scope="function")
 def context_endpoint(mock_crud, context_api):
     context = context_api
@@ -132,6 +458,123 @@ def test_edit_endpoint_by_id(mock_crud, context_endpoint):
     assert endpoint.description == description
     assert set(tags.split()) == set([t.text for t in endpoint.tags])
 
+def test_api_endpoints_pagination(mock_crud, context_endpoint, client):
+    print('\n=> Testing paginating the endpoints of an api in the database')
+    api_id = context_endpoint.get('api_id')
+    for _ in range(2):
+        CRUD.addEndpoint(api_id, generate_random_string(), '/url')
+    assert CRUD.countApiEndpoints(api_id) == 3
+    endpoints = CRUD.getApiEndpoints(api_id, page=1)
+    assert [e.id for e in endpoints][0] == context_endpoint.get('endpoint_id')
+    assert CRUD.getApiEndpoints(api_id, page=2) == []
+    response = client.get('/%d' % api_id)
+    assert response.status_code == 200
+
+    ids, cursor = [], ''
+    while cursor is not None:
+        response = client.get('/api/endpoints/', query_string={'api_id': api_id, 'cursor': cursor, 'sort': 'label'})
+        ids.extend(e['id'] for e in response.json['items'])
+        cursor = response.json['next_cursor']
+    assert sorted(ids) == sorted(e.id for e in CRUD.getApiEndpoints(api_id))
+
+def test_sparse_fieldsets(mock_crud, context_endpoint, client):
+    print('\n=> Testing sparse fieldsets and depth on the apis resources')
+    api_id = context_endpoint.get('api_id')
+    response = client.get('/api/apis/%d?fields=label,endpoints.url' % api_id)
+    assert set(response.json) == {'id', 'label', 'endpoints'}
+    assert set(response.json['endpoints'][0]) == {'id', 'url'}
+    response = client.get('/api/apis/%d?depth=1&exclude=description' % api_id)
+    assert 'description' not in response.json
+    assert 'api_item' not in response.json['endpoints'][0]
+    response = client.get('/api/apis/?fields=unknown')
+    assert response.status_code == 400 and response.json['status'] == 'error'
+    # unknown nested fields, and item views not caching the error
+    endpoint_url = '/api/endpoints/%d' % context_endpoint.get('endpoint_id')
+    for url in ['/api/apis/', '/api/apis/%d' % api_id]:
+        for query in ['fields=endpoints.unknown', 'exclude=endpoints.unknown', 'fields=endpoints.api_item.unknown']:
+            for _ in range(2):
+                response = client.get('%s?%s' % (url, query))
+                assert response.status_code == 400 and response.json['status'] == 'error'
+    for url in ['/api/endpoints/', endpoint_url]:
+        for _ in range(2):
+            response = client.get('%s?exclude=api_item.unknown' % url)
+            assert response.status_code == 400 and response.json['status'] == 'error'
+
+    # ids are kept at every level of a deep field path
+    fields = 'endpoints.api_item.label,endpoints.fields_list.label'
+    response = client.get('/api/apis/%d?fields=%s' % (api_id, fields))
+    assert response.status_code == 200
+    endpoint = response.json['endpoints'][0]
+    assert set(endpoint) == {'id', 'api_item', 'fields_list'}
+    assert set(endpoint['api_item']) == {'id', 'label'}
+    response = client.get('/api/apis/?fields=%s' % fields)
+    assert all(
+        'id' in e and set(e['api_item']) == {'id', 'label'}
+        for api in response.json for e in api['endpoints']
+    )
+
+    schema = schema_variant(ApiSchema, many=True, only=('label', 'url'))
+    db.session.expire_all()
+    with count_queries() as counter:
+        schema.dump(CRUD.getApis(page=1, schema=schema))
+    # the page and its count, no relationship is loaded
+    assert counter['count'] == 2
+
+def test_query_stats_and_budgets(mock_crud, context_endpoint, client, mocker):
+    print('\n=> Testing the per-request query stats, slow-query log and budgets')
+    api_id = context_endpoint.get('api_id')
+    mocker.patch.dict(flask_app.config, {'DB_QUERY_HEADERS': True, 'SLOW_QUERY_THRESHOLD': 0})
+    warning = mocker.spy(flask_app.logger, 'warning')
+    response = client.get('/%d' % api_id)
+    assert 0 < int(response.headers['X-DB-Queries']) <= flask_app.config['DB_QUERY_BUDGETS']['views.detail_api']
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    assert 'countApiEndpoints' in [c.kwargs['extra']['crud_method'] for c in warning.call_args_list]
+
+    mocker.patch.dict(flask_app.config['DB_QUERY_BUDGETS'], {'views.detail_api': 1})
+    mocker.patch.dict(flask_app.config, {'PROPAGATE_EXCEPTIONS': True})
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/%d' % api_id)
+
+def test_fragment_cache(mock_crud, context_endpoint, client, mocker):
+    print('\n=> Testing rendered fragments are cached until their entity changes')
+    api_id = context_endpoint.get('api_id')
+    cache = flask_app.extensions['response_cache']
+    set_fragment = mocker.spy(cache, 'set_fragment')
+    first = client.get('/%d' % api_id).data.decode()
+    stored = set_fragment.call_count
+    assert stored == 2
+    second = client.get('/%d' % api_id).data.decode()
+    assert set_fragment.call_count == stored
+    assert '\x00' not in second and second.count('csrf_token') == first.count('csrf_token')
+
+    label = generate_random_string()
+    CRUD.editApi(api_id, label=label)
+    assert label in client.get('/%d' % api_id).data.decode()
+    # the api card and its endpoints, which show the api, are rendered again
+    assert set_fragment.call_count == 2 * stored
+
+def test_response_compression(mock_crud, context_endpoint, client, mocker):
+    print('\n=> Testing gzip compression of responses and of cached responses')
+    mocker.patch.dict(flask_app.config, {'COMPRESS_MIN_SIZE': 200})
+    compress = mocker.spy(flask_app.extensions['compress'], 'compress')
+    gzipped = {'Accept-Encoding': 'gzip'}
+    url = '/api/apis/%d' % context_endpoint.get('api_id')
+    plain = client.get(url)
+    response = client.get(url, headers=gzipped)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == plain.data
+    assert response.headers['ETag'] == 'W/' + plain.headers['ETag']
+    assert client.get(url, headers=gzipped).data == response.data
+    assert compress.call_count == 1
+    response = client.get(url, headers=dict(gzipped, **{'If-None-Match': response.headers['ETag']}))
+    assert response.status_code == 304
+
+    response = client.get('/api/export/?format=ndjson', headers=gzipped)
+    assert response.is_streamed and response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == client.get('/api/export/?format=ndjson').data
+    response = client.get('/api/apis/?fields=unknown', headers=gzipped)
+    assert 'Content-Encoding' not in response.headers
+
 def test_delete_endpoint_by_id(mock_crud, context_endpoint):
     print('\n=> Testing deleting endpoint by id')
     code = CRUD.deleteEndpoint(context_endpoint.get('endpoint_id'))
@@ -187,11 +630,118 @@ def test_edit_field_by_id(mock_crud, context_field):
     assert field.default == default
     assert field.required == required
 
+def test_export_catalog(mock_crud, context_field, client):
+    print('\n=> Testing streaming the catalog as ndjson and csv')
+    response = client.get('/api/export/?format=ndjson')
+    assert response.is_streamed
+    apis = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert context_field.get('api_id') in [a['id'] for a in apis]
+    response = client.get('/api/export/?format=csv')
+    header = next(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert header == [
+        'api_id', 'api_label', 'api_url', 'api_description', 'api_tags',
+        'endpoint_id', 'endpoint_label', 'endpoint_url', 'endpoint_description', 'endpoint_tags',
+        'field_id', 'field_label', 'field_type', 'field_required', 'field_default', 'field_description'
+    ]
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert context_field.get('field_id') in [int(r['field_id']) for r in rows if r['field_id']]
+
+def test_fast_serializers_parity(mock_crud, context_field):
+    print('\n=> Testing compiled serializers against marshmallow')
+    cases = [
+        (apis_schema, ApiItem),
+        (endpoints_schema, Endpoint),
+        (fields_schema, Field),
+        (tags_schema, Tag),
+        (schema_variant(ApiSchema, many=True, only=('label', 'tags', 'endpoints.fields_list')), ApiItem),
+        (schema_variant(EndpointSchema, many=True, depth=0), Endpoint),
+    ]
+    for schema, model in cases:
+        items = model.query.all()
+        assert json.dumps(fast_dump(schema, items)) == json.dumps(schema.dump(items))
+
+def test_response_cache_etag(mock_crud, context_field, client):
+    print('\n=> Testing cached responses are revalidated and invalidated by writes')
+    field_url = '/api/fields/%d' % context_field.get('field_id')
+    endpoint_url = '/api/endpoints/%d' % context_field.get('endpoint_id')
+    field_etag = client.get(field_url).headers['ETag']
+    endpoint_etag = client.get(endpoint_url).headers['ETag']
+    response = client.get(field_url, headers={'If-None-Match': field_etag})
+    assert response.status_code == 304
+    assert not response.data
+
+    label = generate_random_string()
+    CRUD.editField(context_field.get('field_id'), label=label)
+    response = client.get(field_url, headers={'If-None-Match': field_etag})
+    assert response.status_code == 200
+    assert response.json['label'] == label
+
+    CRUD.editApi(context_field.get('api_id'), label=label)
+    response = client.get(endpoint_url, headers={'If-None-Match': endpoint_etag})
+    assert response.status_code == 200
+    assert response.json['api_item']['label'] == label
+    endpoint_etag = response.headers['ETag']
+
+    # unknown args share the entry of the plain URL
+    cache = flask_app.extensions['response_cache']
+    hits = cache.hits
+    response = client.get(endpoint_url + '?utm_source=%s' % generate_random_string())
+    assert response.headers['ETag'] == endpoint_etag and cache.hits == hits + 1
+
+    # a write while a response is built leaves it unstored
+    field_id = context_field.get('field_id')
+    cache.invalidate('field:%d' % field_id)
+    get_field = JsonMethods.get_field
+    def racing_get_field(id):
+        data = get_field(id)
+        CRUD.editField(id, label=generate_random_string())
+        return data
+    with mock.patch('api.JsonMethods.get_field', side_effect=racing_get_field):
+        stale = client.get(field_url).json['label']
+    assert client.get(field_url).json['label'] == CRUD.getField(field_id).label != stale
+
+    generation = cache.generation()
+    cache.invalidate(SEARCH_TAG)
+    cache.set_search('racing', [1], generation)
+    assert cache.get_search('racing') is None
+    cache.set_search('racing', [1], cache.generation())
+    assert cache.get_search('racing') == [1]
+
+def test_cache_backends_limits(tmp_path, mocker):
+    print('\n=> Testing cache entries expire and the filesystem cache is capped')
+    now = mocker.patch('cache.time.time')
+    for backend in [LRUBackend(ttl=60), FileSystemBackend(str(tmp_path), max_entries=3, ttl=60)]:
+        now.return_value = 1000.0
+        backend.set('key', 'value')
+        now.return_value = 1059.0
+        assert backend.get('key') == 'value'
+        now.return_value = 1060.0
+        assert backend.get('key') is None
+
+    backend = FileSystemBackend(str(tmp_path), max_entries=3)
+    for i in range(5):
+        backend.set('key%d' % i, i)
+        os.utime(backend._path('key%d' % i), (i, i))
+    assert len(list(tmp_path.iterdir())) == 3
+    assert [backend.get('key%d' % i) for i in range(5)] == [None, None, 2, 3, 4]
+
 def test_deleting_field(mock_crud, context_field):
     print('\n=> Testing deleting field by id')
     code = CRUD.deleteField(context_field.get('field_id'))
     assert code>0
 
+def test_counters_follow_writes(mock_crud, context_field):
+    print('\n=> Testing counters are maintained on writes and can be reconciled')
+    counts = {name: CRUD.getCount(name) for name in ['api_item', 'endpoint', 'field']}
+    CRUD.deleteApi(context_field.get('api_id'))
+    assert CRUD.getCount('api_item') == counts['api_item'] - 1
+    assert CRUD.getCount('endpoint') == counts['endpoint'] - 1
+    assert CRUD.getCount('field') == counts['field'] - 1
+    assert CRUD.reconcileCounters() == []
+    db.session.query(Counter).filter_by(name='tag').update({'value': -1})
+    assert CRUD.reconcileCounters() == ['tag']
+    assert CRUD.getCount('tag') == Tag.query.count()
+
 def test_cascade_delete_api_by_id(mock_crud, context_field):
     print('\n=> Testing cascade deleting api by id')
     api_id = context_field.get('api_id')
@@ -204,3 +754,15 @@ def test_cascade_delete_api_by_id(mock_crud, context_field):
     assert existing_endpoint_id is None
     existing_field = CRUD.getField(field_id)
     assert existing_field is None
+
+def test_apis_listing_query_count(mock_crud, context_field):
+    print('\n=> Testing the apis listing costs a fixed number of queries')
+    api_id = context_field.get('api_id')
+    for _ in range(3):
+        endpoint_id = CRUD.addEndpoint(api_id, generate_random_string(), '/url', tags='a b')
+        CRUD.addEndpointField(endpoint_id, generate_random_string(), 'string')
+    db.session.expire_all()
+    with count_queries() as counter:
+        apis = apis_schema.dump(CRUD.getApis(page=1, schema=apis_schema))
+    assert apis
+    assert counter['count'] <= 6
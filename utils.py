@@ -1,5 +1,5 @@
 from urllib.parse import urlparse
-import json, re, string, random
+import json, re, string, random, base64
 from urllib.parse import urlencode
 from urllib import request
 
@@ -15,6 +15,26 @@ def paginate(l, per_page, page, sort_expression=None):
     sub_list = slices[page-1]
     return sub_list
 
+def encode_cursor(sort, key):
+    '''Builds an opaque pagination cursor from a sort column and the sort key
+    of the last item of a page.'''
+    raw = json.dumps({'sort': sort, 'key': list(key)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    '''Reverts encode_cursor. Returns (sort, key), the key being a non empty
+    tuple of strings and integers, or raises ValueError.'''
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        sort, key = raw['sort'], tuple(raw['key'])
+    except Exception:
+        raise ValueError('%s is not a valid cursor' % cursor)
+    if (sort is not None and not isinstance(sort, str)) or not key or not all(
+        isinstance(k, (str, int)) and not isinstance(k, bool) for k in key
+    ):
+        raise ValueError('%s is not a valid cursor' % cursor)
+    return sort, key
+
 def list_obj_stringify(params):
     list_str = params[0]
     attribute = params[1]
@@ -42,6 +62,18 @@ def flatten_json(nested_json, exclude=None):
     flatten(nested_json)
     return out
 
+def iter_ndjson(stream):
+    '''Yields the objects of a newline delimited JSON stream one at a time.
+    Lines that cannot be parsed are yielded as ValueError instances.'''
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError('Invalid JSON line: %s' % e)
+
 def get_json_response(current_app, view_name, *args, **kwargs):
     '''Calls internal view method, parses json, and returns python dict.'''
     view = current_app.view_functions[view_name]
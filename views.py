@@ -3,7 +3,6 @@ from flask_paginate import Pagination, get_page_parameter
 
 from api import JsonMethods
 from forms import AddApiForm, EditApiForm, AddEndpointForm, EditEndpointForm, AddFieldForm, EditFieldForm
-from utils import paginate
 from config import Globals
 
 views = Blueprint('views', __name__)
@@ -27,18 +26,12 @@ def list_apis():
 @views.route('/<int:id>')
 def detail_api(id):
     page = request.args.get('page', type=int, default=1)
-    api = JsonMethods.get_api(id)
-    endpoints = api.get('endpoints')
-    total = len(endpoints)
-    if total:
-        try:
-            endpoints = paginate(
-                endpoints, Globals.ITEM_PER_PAGE,
-                page, lambda x: int(x.get('id'))
-            )
-        except:
-            flash('There is no %d pages of endpoints for API %d' % (page, api_id), 'danger')
-            return redirect(url_for('views.list_endpoints'))
+    api = JsonMethods.get_api(id, nested=False)
+    total = JsonMethods.get_api_endpoints_count(id).get('count')
+    if total and (page - 1) * Globals.ITEM_PER_PAGE >= total:
+        flash('There is no %d pages of endpoints for API %d' % (page, id), 'danger')
+        return redirect(url_for('views.list_endpoints'))
+    endpoints = JsonMethods.get_endpoints(api_id=id, page=page)
 
     pagination = Pagination(
         page=page, per_page=Globals.ITEM_PER_PAGE,